@@ -4,7 +4,9 @@ TODO
 DETAILS
 """
 import asyncio
+from datetime import timedelta
 import logging
+import os
 import sys
 
 import homeassistant.helpers.config_validation as cv
@@ -12,21 +14,48 @@ import voluptuous as vol
 from homeassistant import config_entries
 from homeassistant.config_entries import SOURCE_DISCOVERY, ConfigEntry
 from homeassistant.const import CONF_PASSWORD, CONF_USERNAME
-from homeassistant.core import HomeAssistant
-from homeassistant.helpers import discovery
-from homeassistant.helpers.event import async_track_time_interval, track_time_interval
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers import device_registry as dr, discovery
+from homeassistant.helpers.dispatcher import async_dispatcher_send
+from homeassistant.helpers.event import async_call_later, async_track_time_interval, track_time_interval
+from homeassistant.helpers.storage import Store
 from homeassistant.helpers.typing import ConfigType
 from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
-
-from .api import PandoraApi, PandoraApiException
+from homeassistant.util import dt as dt_util
+
+from .api import DEVICES_REFRESH_INTERVAL, PandoraApi, PandoraApiException
+from .backfill import async_backfill
+from .base import async_setup_device_storage
+from .export import EXPORT_FORMATS, geojson_chunks, gpx_chunks, write_chunks
+from .profiler import async_profile
+from .publisher import PandoraMqttPublisher
+from .views import async_register_views
+from .websocket import async_register_commands
 from .const import (
     DOMAIN,
     CONF_POLLING_INTERVAL,
     DEFAULT_POLLING_INTERVAL,
     MIN_POLLING_INTERVAL,
+    CONF_COALESCE_WRITES,
+    CONF_MIN_WRITE_INTERVAL,
+    DEFAULT_MIN_WRITE_INTERVAL,
+    CONF_HOSTS,
+    DEFAULT_HOSTS,
+    CONF_MQTT_PREFIX,
+    DEFAULT_MQTT_PREFIX,
+    CONF_MQTT_QOS,
+    DEFAULT_MQTT_QOS,
     ATTR_SCHEMA,
     ATTR_ID,
     ATTR_COMMAND,
+    ATTR_START,
+    ATTR_END,
+    ATTR_FORMAT,
+    ATTR_FILENAME,
+    ATTR_DURATION,
+    ATTR_SPEED,
+    SIGNAL_DEVICE_ADDED,
+    EVENT_DRIVING,
 )
 
 
@@ -35,14 +64,25 @@ _LOGGER = logging.getLogger(__name__)
 
 CONFIG_SCHEMA = vol.Schema(
     {
-        DOMAIN: vol.Schema(
-            {
-                vol.Required(CONF_USERNAME): cv.string,
-                vol.Required(CONF_PASSWORD): cv.string,
-                vol.Optional(CONF_POLLING_INTERVAL, default=DEFAULT_POLLING_INTERVAL): (
-                    vol.All(cv.time_period, vol.Clamp(min=MIN_POLLING_INTERVAL))
-                ),
-            }
+        DOMAIN: vol.All(
+            # State writes aren't batched anymore, the option is accepted and ignored
+            cv.deprecated(CONF_COALESCE_WRITES),
+            vol.Schema(
+                {
+                    vol.Required(CONF_USERNAME): cv.string,
+                    vol.Required(CONF_PASSWORD): cv.string,
+                    vol.Optional(CONF_POLLING_INTERVAL, default=DEFAULT_POLLING_INTERVAL): (
+                        vol.All(cv.time_period, vol.Clamp(min=MIN_POLLING_INTERVAL))
+                    ),
+                    vol.Optional(CONF_COALESCE_WRITES): cv.boolean,
+                    vol.Optional(CONF_MIN_WRITE_INTERVAL, default=DEFAULT_MIN_WRITE_INTERVAL): cv.positive_int,
+                    vol.Optional(CONF_HOSTS, default=[DEFAULT_HOSTS]): vol.All(cv.ensure_list, [cv.url]),
+                    vol.Optional(CONF_MQTT_PREFIX, default=DEFAULT_MQTT_PREFIX): cv.string,
+                    vol.Optional(CONF_MQTT_QOS, default=DEFAULT_MQTT_QOS): vol.All(
+                        vol.Coerce(int), vol.In([0, 1, 2])
+                    ),
+                }
+            ),
         ),
     },
     extra=vol.ALLOW_EXTRA,
@@ -62,13 +102,69 @@ SERVICE_MAP = {
 }
 
 
-PANDORA_CAS_PLATFORMS = ["sensor", "binary_sensor", "device_tracker"]
+EXPORT_TRACK_SCHEMA = vol.Schema(
+    {
+        vol.Required(ATTR_ID): cv.string,
+        vol.Optional(ATTR_START): cv.datetime,
+        vol.Optional(ATTR_END): cv.datetime,
+        vol.Optional(ATTR_FORMAT, default=EXPORT_FORMATS[0]): vol.In(EXPORT_FORMATS),
+        vol.Optional(ATTR_FILENAME): cv.string,
+    }
+)
+
+EXPORT_WRITERS = {"gpx": gpx_chunks, "geojson": geojson_chunks}
+
+TRAFFIC_FILENAME = "pandora_cas_traffic.jsonl.gz"
+
+RECORD_TRAFFIC_SCHEMA = vol.Schema(
+    {
+        vol.Optional(ATTR_DURATION, default=timedelta(hours=1)): cv.time_period,
+        vol.Optional(ATTR_FILENAME, default=TRAFFIC_FILENAME): cv.string,
+    }
+)
+
+BACKFILL_SCHEMA = vol.Schema(
+    {
+        vol.Optional(ATTR_ID): cv.string,
+        vol.Required(ATTR_START): cv.datetime,
+        vol.Optional(ATTR_END): cv.datetime,
+    }
+)
+
+PROFILE_FILENAME = "pandora_cas_profile"
+
+PROFILE_SCHEMA = vol.Schema(
+    {
+        vol.Optional(ATTR_DURATION, default=timedelta(minutes=1)): cv.time_period,
+        vol.Optional(ATTR_FILENAME, default=PROFILE_FILENAME): cv.string,
+    }
+)
+
+LAST_UPDATE_STORAGE_VERSION = 1
+LAST_UPDATE_STORAGE_KEY = DOMAIN + ".last_update"
+LAST_UPDATE_SAVE_DELAY = 60
+
+HISTORY_STORAGE_KEY = DOMAIN + ".history_{}"
+HISTORY_SAVE_DELAY = 300
+
+REPLAY_TRAFFIC_SCHEMA = vol.Schema(
+    {
+        vol.Optional(ATTR_FILENAME, default=TRAFFIC_FILENAME): cv.string,
+        vol.Optional(ATTR_SPEED, default=1.0): vol.All(vol.Coerce(float), vol.Range(min=0.01)),
+    }
+)
+
+
+PANDORA_CAS_PLATFORMS = ["sensor", "binary_sensor", "device_tracker", "lock", "switch"]
 
 
 async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
     """Activate Pandora Car Alarm System component"""
 
     hass.data[DOMAIN] = {}
+    async_register_views(hass)
+    async_register_commands(hass)
+
     if DOMAIN not in config:
         return True
 
@@ -80,6 +176,9 @@ async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
         domain_config.pop(CONF_POLLING_INTERVAL, None)
         domain_config[CONF_POLLING_INTERVAL] = seconds
 
+        # Config flow keeps hosts as a comma separated string
+        domain_config[CONF_HOSTS] = ", ".join(domain_config[CONF_HOSTS])
+
         if not hass.config_entries.async_entries(DOMAIN):
             hass.async_create_task(
                 hass.config_entries.flow.async_init(DOMAIN, context={"source": SOURCE_DISCOVERY}, data=domain_config)
@@ -98,6 +197,10 @@ async def async_setup_entry(hass: HomeAssistant, config_entry: ConfigEntry) -> b
     username = config_entry.data[CONF_USERNAME]
     password = config_entry.data[CONF_PASSWORD]
     polling_interval = config_entry.data[CONF_POLLING_INTERVAL]
+    min_write_interval = config_entry.data.get(CONF_MIN_WRITE_INTERVAL, DEFAULT_MIN_WRITE_INTERVAL)
+    hosts = cv.ensure_list_csv(config_entry.data.get(CONF_HOSTS) or DEFAULT_HOSTS)
+    mqtt_prefix = config_entry.data.get(CONF_MQTT_PREFIX, DEFAULT_MQTT_PREFIX)
+    mqtt_qos = config_entry.data.get(CONF_MQTT_QOS, DEFAULT_MQTT_QOS)
 
     _LOGGER.debug("Setting up entry %s for account %s", config_entry.entry_id, username)
 
@@ -109,8 +212,87 @@ async def async_setup_entry(hass: HomeAssistant, config_entry: ConfigEntry) -> b
     for service, service_config in SERVICE_MAP.items():
         hass.services.async_register(DOMAIN, service, _execute_command, schema=service_config[ATTR_SCHEMA])
 
+    async def _export_track(call) -> None:
+        """Write the stored track of the device to /config/www in chunks."""
+        api = hass.data[DOMAIN]
+        device = api.devices.get(call.data[ATTR_ID])
+        if device is None:
+            _LOGGER.error("Export failed: unknown PANDORA_ID '%s'", call.data[ATTR_ID])
+            return
+
+        start = call.data.get(ATTR_START)
+        end = call.data.get(ATTR_END)
+        start = int(dt_util.as_timestamp(start)) if start else None
+        end = int(dt_util.as_timestamp(end)) if end else None
+
+        file_format = call.data[ATTR_FORMAT]
+        filename = call.data.get(ATTR_FILENAME) or "pandora_{}_{}_{}.{}".format(
+            device.pandora_id, start or "begin", end or "end", file_format
+        )
+        path = hass.config.path("www", os.path.basename(filename))
+
+        # Points are decoded in the executor, so take a copy the event loop won't mutate
+        chunks = EXPORT_WRITERS[file_format](device.name, device.track.copy().points(start, end))
+        await hass.async_add_executor_job(os.makedirs, os.path.dirname(path), 0o755, True)
+        size = await hass.async_add_executor_job(write_chunks, path, chunks)
+
+        _LOGGER.info("Track of %s is exported to %s (%d bytes)", device.name, path, size)
+
+    hass.services.async_register(DOMAIN, "export_track", _export_track, schema=EXPORT_TRACK_SCHEMA)
+
+    async def _record_traffic(call) -> None:
+        """Record the raw API traffic to /config for the given time."""
+        api = hass.data[DOMAIN]
+        api.start_recording(hass.config.path(os.path.basename(call.data[ATTR_FILENAME])))
+
+        def _stop(*_) -> None:
+            api.stop_recording()
+
+        config_entry.async_on_unload(async_call_later(hass, call.data[ATTR_DURATION], _stop))
+
+    async def _stop_recording(call) -> None:
+        hass.data[DOMAIN].stop_recording()
+
+    async def _replay_traffic(call) -> None:
+        """Feed the recorded traffic from /config into the replay client, e.g. while profiling."""
+        path = hass.config.path(os.path.basename(call.data[ATTR_FILENAME]))
+        count = await hass.data[DOMAIN].async_replay(path, call.data[ATTR_SPEED])
+        _LOGGER.info("Replayed %d updates from %s", count, path)
+
+    hass.services.async_register(DOMAIN, "record_traffic", _record_traffic, schema=RECORD_TRAFFIC_SCHEMA)
+    hass.services.async_register(DOMAIN, "stop_recording", _stop_recording)
+    hass.services.async_register(DOMAIN, "replay_traffic", _replay_traffic, schema=REPLAY_TRAFFIC_SCHEMA)
+
+    async def _backfill(call) -> None:
+        """Fetch the server-side history of the time range."""
+        start = int(dt_util.as_timestamp(call.data[ATTR_START]))
+        end = int(dt_util.as_timestamp(call.data.get(ATTR_END) or dt_util.utcnow()))
+        pandora_ids = [call.data[ATTR_ID]] if ATTR_ID in call.data else None
+        await async_backfill(hass, hass.data[DOMAIN], start, end, pandora_ids)
+
+    hass.services.async_register(DOMAIN, "backfill", _backfill, schema=BACKFILL_SCHEMA)
+
+    async def _profile(call) -> None:
+        """Profile the integration under the real load, results are written to /config."""
+        path = hass.config.path(os.path.basename(call.data[ATTR_FILENAME]))
+        try:
+            summary = await async_profile(hass, call.data[ATTR_DURATION].total_seconds(), path)
+        except ValueError as ex:
+            _LOGGER.error("Profiling failed: %s", str(ex))
+            return
+        _LOGGER.info("Profile is written to %s.prof\n%s", path, summary)
+
+    hass.services.async_register(DOMAIN, "profile", _profile, schema=PROFILE_SCHEMA)
+
+    last_update_store = Store(hass, LAST_UPDATE_STORAGE_VERSION, LAST_UPDATE_STORAGE_KEY)
+    last_update = await last_update_store.async_load()
+
     try:
-        api = hass.data[DOMAIN] = PandoraApi(hass, username, password, polling_interval)
+        api = hass.data[DOMAIN] = PandoraApi(
+            hass, username, password, polling_interval, hosts, min_write_interval
+        )
+        if last_update:
+            api.restore_last_update_time(last_update["time"])
         await api.load_devices()
         await api.async_refresh()
 
@@ -123,13 +305,82 @@ async def async_setup_entry(hass: HomeAssistant, config_entry: ConfigEntry) -> b
         _LOGGER.error("Setting up entry %s failed: %s", username, str(ex))
         return False
 
+    async def _options_updated(hass: HomeAssistant, config_entry: ConfigEntry) -> None:
+        """Apply changed options of devices without a restart."""
+        for pandora_id, options in config_entry.options.items():
+            device = api.devices.get(pandora_id)
+            if device is not None:
+                await device.config_options(options)
+
+    config_entry.async_on_unload(config_entry.add_update_listener(_options_updated))
+
+    await async_setup_device_storage(hass, config_entry, HISTORY_STORAGE_KEY, "history", HISTORY_SAVE_DELAY)
     await hass.config_entries.async_forward_entry_setups(config_entry, PANDORA_CAS_PLATFORMS)
 
+    @callback
+    def _fire_driving_events() -> None:
+        """Fire events detected by the driving behaviour detectors.
+
+        All devices are checked, trips of parked cars end by timeout without any changes.
+        """
+        for pandora_id, device in api.devices.items():
+            for event_type, data in device.driving.pop_events():
+                hass.bus.async_fire(EVENT_DRIVING, {"pandora_id": pandora_id, "type": event_type, **data})
+
+    config_entry.async_on_unload(api.async_add_listener(_fire_driving_events))
+
+    @callback
+    def _backfill_gaps() -> None:
+        """Backfill the history missed during the downtime in background."""
+        last_update_store.async_delay_save(lambda: {"time": api.last_update_time}, LAST_UPDATE_SAVE_DELAY)
+        for start, end in api.pop_gaps():
+            _LOGGER.info("Updates were interrupted for %d seconds, backfilling", end - start)
+            hass.async_create_task(async_backfill(hass, api, start, end))
+
+    # Gap after the restart is detected by the first update, before the listener is added
+    _backfill_gaps()
+    config_entry.async_on_unload(api.async_add_listener(_backfill_gaps))
+
+    if mqtt_prefix:
+        config_entry.async_on_unload(PandoraMqttPublisher(hass, api, mqtt_prefix, mqtt_qos).async_start())
+
+    async def _refresh_devices(*_) -> None:
+        """Pick up added, removed and renamed cars without reloading the integration."""
+        try:
+            added, removed, updated = await api.async_refresh_devices()
+        except PandoraApiException as ex:
+            _LOGGER.info("Devices refresh failed: %s", str(ex))
+            return
+
+        registry = dr.async_get(hass)
+
+        for device in added:
+            if device.pandora_id in config_entry.options:
+                await device.config_options(config_entry.options[device.pandora_id])
+            async_dispatcher_send(hass, SIGNAL_DEVICE_ADDED, device)
+
+        for device in removed:
+            device_entry = registry.async_get_device(identifiers={(DOMAIN, device.pandora_id)})
+            if device_entry is not None:
+                registry.async_remove_device(device_entry.id)
+
+        for device in updated:
+            device_entry = registry.async_get_device(identifiers={(DOMAIN, device.pandora_id)})
+            if device_entry is not None:
+                registry.async_update_device(
+                    device_entry.id, name=device.name, model=device.model, sw_version=device.firmware
+                )
+
+    config_entry.async_on_unload(
+        async_track_time_interval(hass, _refresh_devices, timedelta(seconds=DEVICES_REFRESH_INTERVAL))
+    )
+
     return True
 
 
 async def async_unload_entry(hass: HomeAssistant, config_entry: ConfigEntry) -> bool:
     """Unload the config entry and platforms."""
-    hass.data.pop(DOMAIN)
+    api = hass.data.pop(DOMAIN)
+    await api.async_close()
 
-    return await hass.config_entries.async_unload_platforms(entry, PANDORA_CAS_PLATFORMS)
+    return await hass.config_entries.async_unload_platforms(config_entry, PANDORA_CAS_PLATFORMS)
@@ -0,0 +1,87 @@
+"""Backfill of the history which was missed while Home Assistant or the connection was down.
+
+Server-side track is merged into the stored track of the device tracker. Speed and event counts are
+imported as hourly external statistics. Nothing is written as the state or fired on the bus, so the
+history doesn't trigger automations.
+"""
+
+import logging
+
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.dispatcher import async_dispatcher_send
+from homeassistant.util import dt as dt_util
+
+from .api import PandoraApi, PandoraApiException
+from .const import DOMAIN, SIGNAL_TRACK_UPDATED
+
+
+_LOGGER = logging.getLogger(__name__)
+
+HOUR = 3600
+
+
+def _hourly(records: list, value) -> dict:
+    """Group values of records by the start of the hour."""
+    buckets = {}
+    for record in records:
+        buckets.setdefault(record["ts"] - record["ts"] % HOUR, []).append(value(record))
+    return buckets
+
+
+def _async_import_statistics(hass: HomeAssistant, pandora_id: str, name: str, points: list, events: list) -> None:
+    """Import hourly speed and event count statistics of the device."""
+    # pylint: disable=import-outside-toplevel
+    from homeassistant.components.recorder.models import StatisticData, StatisticMetaData
+    from homeassistant.components.recorder.statistics import async_add_external_statistics
+
+    event_counts = {hour: [len(items)] for hour, items in _hourly(events, lambda event: event["ts"]).items()}
+    series = (
+        ("speed", "speed", "km/h", _hourly(points, lambda point: point["speed"])),
+        ("events", "events per hour", None, event_counts),
+    )
+    for key, title, units, buckets in series:
+        if not buckets:
+            continue
+
+        metadata = StatisticMetaData(
+            has_mean=True,
+            has_sum=False,
+            name="{} {}".format(name, title),
+            source=DOMAIN,
+            statistic_id="{}:{}_{}".format(DOMAIN, pandora_id, key),
+            unit_of_measurement=units,
+        )
+        statistics = [
+            StatisticData(
+                start=dt_util.utc_from_timestamp(hour), mean=sum(values) / len(values), min=min(values), max=max(values)
+            )
+            for hour, values in sorted(buckets.items())
+        ]
+        async_add_external_statistics(hass, metadata, statistics)
+
+
+async def async_backfill(hass: HomeAssistant, api: PandoraApi, start: int, end: int, pandora_ids: list = None) -> None:
+    """Fetch the history of devices within the time range and store it."""
+    for pandora_id in pandora_ids or list(api.devices):
+        device = api.devices.get(pandora_id)
+        if device is None:
+            _LOGGER.error("Backfill failed: unknown PANDORA_ID '%s'", pandora_id)
+            continue
+
+        try:
+            points, events = await api.async_fetch_history(pandora_id, start, end)
+        except PandoraApiException as ex:
+            _LOGGER.info("Backfill of %s failed: %s", device.name, str(ex))
+            continue
+
+        if points:
+            added = device.track.merge(
+                (point["ts"], point["x"], point["y"], point["speed"], point["rot"]) for point in points
+            )
+            async_dispatcher_send(hass, SIGNAL_TRACK_UPDATED.format(pandora_id))
+            _LOGGER.debug("Track of %s got %d points", device.name, added)
+
+        if "recorder" in hass.config.components:
+            _async_import_statistics(hass, pandora_id, device.name, points, events)
+
+        _LOGGER.info("Backfilled %s from %s to %s", device.name, start, end)
@@ -4,17 +4,158 @@ TODO
 DETAILS
 """
 import logging
+from time import monotonic
 
 from homeassistant.const import ATTR_DEVICE_CLASS, ATTR_NAME
+from homeassistant.core import callback
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers import entity_registry as er
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
 from homeassistant.helpers.entity import Entity
+from homeassistant.helpers.event import async_call_later
+from homeassistant.helpers.storage import Store
 from homeassistant.util import slugify
 
-from .api import PandoraDevice
-from .const import DOMAIN, ATTR_DEVICE_ATTR, ATTR_IS_CONNECTION_SENSITIVE
+from .api import PandoraApiException, PandoraDevice
+from .const import (
+    DOMAIN,
+    ATTR_DEVICE_ATTR,
+    ATTR_IS_CONNECTION_SENSITIVE,
+    ATTR_THROTTLED,
+    ATTR_FEATURE,
+    ATTR_PERMISSION,
+    ATTR_NONZERO,
+    ATTR_SHIFT_BITS,
+    ATTR_COMMAND_ON,
+    ATTR_COMMAND_OFF,
+    SIGNAL_DEVICE_ADDED,
+)
 
 
 _LOGGER = logging.getLogger(__name__)
 
+DEVICE_STORAGE_VERSION = 1
+
+
+def is_supported(device: PandoraDevice, entity_config: dict) -> bool:
+    """Check features and permissions of the device required by the entity."""
+    feature = entity_config.get(ATTR_FEATURE)
+    if feature is not None and not device.has_feature(feature):
+        return False
+
+    permission = entity_config.get(ATTR_PERMISSION)
+    return permission is None or device.permission(permission) > 0
+
+
+def is_observed(device: PandoraDevice, entity_config: dict) -> bool:
+    """Check that the device really reports the attribute of the entity."""
+    try:
+        value = getattr(device, entity_config[ATTR_DEVICE_ATTR])
+    except KeyError:
+        return False
+
+    if value is None:
+        return False
+    return not entity_config.get(ATTR_NONZERO) or value != 0
+
+
+@callback
+def device_info(device: PandoraDevice) -> dict:
+    """Unified device info dictionary."""
+    return {
+        "identifiers": {(DOMAIN, device.pandora_id)},
+        "name": device.name,
+        "manufacturer": "Pandora",
+        "model": device.model,
+        "sw_version": device.firmware,
+    }
+
+
+async def async_setup_device_storage(hass, entry, key: str, attr: str, save_delay: int) -> None:
+    """Restore the state kept in the attribute of every device and store it after updates.
+
+    The attribute must provide as_dict() and restore(data). Key is formatted with the PANDORA_ID.
+    """
+    api = hass.data[DOMAIN]
+    stores = {}
+
+    async def _async_restore(device: PandoraDevice) -> None:
+        store = Store(hass, DEVICE_STORAGE_VERSION, key.format(slugify(device.pandora_id)))
+        stores[device.pandora_id] = store
+        data = await store.async_load()
+        if data:
+            getattr(device, attr).restore(data)
+
+    @callback
+    def _async_add_device(device: PandoraDevice) -> None:
+        hass.async_create_task(_async_restore(device))
+
+    @callback
+    def _async_save() -> None:
+        for pandora_id in api.changes:
+            store = stores.get(pandora_id)
+            device = api.devices.get(pandora_id)
+            if store is not None and device is not None:
+                store.async_delay_save(getattr(device, attr).as_dict, save_delay)
+
+    for device in api.devices.values():
+        await _async_restore(device)
+
+    entry.async_on_unload(async_dispatcher_connect(hass, SIGNAL_DEVICE_ADDED, _async_add_device))
+    entry.async_on_unload(api.async_add_listener(_async_save))
+
+
+def async_setup_device_entities(hass, entry, async_add_entities, platform: str, entity_class, entity_configs: dict):
+    """Create entities of the platform for all devices according to their capabilities.
+
+    Entities unsupported by features/permissions are never created (and removed from the registry).
+    Entities which attributes weren't observed yet are created later on the first update that has them.
+    """
+    api = hass.data[DOMAIN]
+    registry = er.async_get(hass)
+    pending = {}
+
+    def _create_entities(device: PandoraDevice) -> list:
+        entities = []
+        for entity_id, entity_config in entity_configs.items():
+            if not is_supported(device, entity_config):
+                unique_id = "{}_{}_{}".format(DOMAIN, slugify(device.pandora_id), entity_id)
+                registry_id = registry.async_get_entity_id(platform, DOMAIN, unique_id)
+                if registry_id is not None:
+                    registry.async_remove(registry_id)
+                continue
+
+            if is_observed(device, entity_config):
+                entities.append(entity_class(hass, device, entity_id, entity_config))
+            else:
+                pending[(device.pandora_id, entity_id)] = (device, entity_config)
+        return entities
+
+    @callback
+    def _async_add_device(device: PandoraDevice) -> None:
+        async_add_entities(_create_entities(device), False)
+
+    @callback
+    def _async_check_pending() -> None:
+        entities = []
+        for key, (device, entity_config) in list(pending.items()):
+            if device.pandora_id not in api.devices:
+                del pending[key]
+            elif is_observed(device, entity_config):
+                del pending[key]
+                entities.append(entity_class(hass, device, key[1], entity_config))
+        if entities:
+            async_add_entities(entities, False)
+
+    entry.async_on_unload(async_dispatcher_connect(hass, SIGNAL_DEVICE_ADDED, _async_add_device))
+    entry.async_on_unload(api.async_add_listener(_async_check_pending))
+
+    entities = []
+    for _, device in api.devices.items():
+        entities.extend(_create_entities(device))
+
+    async_add_entities(entities, False)
+
 
 class PandoraEntity(Entity):
     """ TODO """
@@ -31,6 +172,9 @@ class PandoraEntity(Entity):
         self._config = entity_config
         self._state = None
         self._expired = True
+        self._stale = False
+        self._last_write = 0.0
+        self._deferred_write = None
 
     @property
     def unique_id(self) -> str:
@@ -75,10 +219,131 @@ class PandoraEntity(Entity):
 
     @property
     def extra_state_attributes(self):
-        """Return the state attributes of the sensor."""
-        return {"car": self._device.name}
+        """Return the state attributes of the sensor.
+
+        Stale flag is set while the server is unreachable: the last known state is kept instead of
+        making entity unavailable.
+        """
+        attributes = {"car": self._device.name}
+        if self._stale:
+            attributes["stale"] = True
+        return attributes
 
     @property
     def device_info(self):
         """Unified device info dictionary."""
-        return self._device.device_info
+        return device_info(self._device)
+
+    @callback
+    def _async_write_state(self) -> None:
+        """Write the state.
+
+        Noisy attributes (like speed) are throttled: they are written not more often than the configured
+        interval while the car is moving. Writes inside the interval are deferred, so the latest value is never lost.
+        """
+        interval = self._hass.data[DOMAIN].min_write_interval if self._config.get(ATTR_THROTTLED) else 0
+        if interval and self._device.is_moving:
+            elapsed = monotonic() - self._last_write
+            if elapsed < interval:
+                if self._deferred_write is None:
+                    self._deferred_write = async_call_later(self._hass, interval - elapsed, self._async_deferred_write)
+                return
+
+        self._cancel_deferred_write()
+        self._last_write = monotonic()
+        self.async_write_ha_state()
+
+    @callback
+    def _async_deferred_write(self, *_) -> None:
+        """Write the state postponed by the minimal write interval."""
+        self._deferred_write = None
+        self._last_write = monotonic()
+        self.async_write_ha_state()
+
+    def _cancel_deferred_write(self) -> None:
+        """Cancel postponed write if any."""
+        if self._deferred_write is not None:
+            self._deferred_write()
+            self._deferred_write = None
+
+    async def async_will_remove_from_hass(self):
+        """When entity will be removed from hass."""
+        self._cancel_deferred_write()
+
+
+class PandoraCommandEntity(PandoraEntity):
+    """Entity controlled by commands with state in one bit of the device attribute.
+
+    The new state is shown optimistically as soon as the command is requested. The command completes
+    when the bit really flips; on failure the previous state is restored. Entities without the bit
+    (ATTR_SHIFT_BITS is None) keep assumed state and complete on the command response.
+    """
+
+    def __init__(self, hass, device: PandoraDevice, entity_id: str, entity_config: dict):
+        """Constructor."""
+        super().__init__(hass, device, entity_id, entity_config)
+        self._optimistic = False
+
+    @property
+    def shift_bits(self):
+        """Bit of the state in the device attribute."""
+        return self._config.get(ATTR_SHIFT_BITS)
+
+    @property
+    def assumed_state(self) -> bool:
+        """Return True if the state can't be read from the device."""
+        return self.shift_bits is None
+
+    def _read_state(self) -> bool:
+        """Read the state from the device. Raises KeyError if there is no data yet."""
+        return bool((int(getattr(self._device, self.device_attr)) >> self.shift_bits) & 1)
+
+    async def _async_command(self, state: bool) -> None:
+        """Send the command which should switch the entity to the state."""
+        command = self._config[ATTR_COMMAND_ON if state else ATTR_COMMAND_OFF]
+        predicate = None
+        if self.shift_bits is not None:
+            shift_bits = self.shift_bits
+            device_attr = self.device_attr
+
+            def predicate(device):
+                return bool((int(getattr(device, device_attr)) >> shift_bits) & 1) == state
+
+        previous = self._state
+        self._optimistic = True
+        self._state = state
+        self.async_write_ha_state()
+
+        try:
+            await self._hass.data[DOMAIN].async_command(self._device.pandora_id, command, predicate)
+        except PandoraApiException as ex:
+            self._state = previous
+            raise HomeAssistantError("{}: {}".format(self.name, ex)) from None
+        finally:
+            self._optimistic = False
+            self.async_write_ha_state()
+
+    @callback
+    def _update_callback(self, force=False):
+        """"""
+        if self._optimistic:
+            return
+
+        api = self._hass.data[DOMAIN]
+        try:
+            state = self._state if self.shift_bits is None else self._read_state()
+            expired = api.timestamp - self._device.timestamp > self._device.expire_after
+
+            if self._state != state or self._expired != expired or self._stale != api.is_stale:
+                self._state = state
+                self._expired = expired
+                self._stale = api.is_stale
+                self._async_write_state()
+        except KeyError:
+            _LOGGER.warning("%s: can't get data from linked device", self.name)
+
+    async def async_added_to_hass(self):
+        """When entity is added to hass."""
+
+        self.async_on_remove(self._hass.data[DOMAIN].async_add_listener(self._update_callback))
+        self._update_callback(True)
@@ -6,6 +6,7 @@ DETAILS
 import logging
 
 from homeassistant.components.binary_sensor import (
+    DOMAIN as BINARY_SENSOR_DOMAIN,
     ENTITY_ID_FORMAT,
     BinarySensorEntity,
     BinarySensorDeviceClass,
@@ -16,8 +17,15 @@ from homeassistant.core import HomeAssistant, callback
 from homeassistant.util import slugify
 
 from .api import PandoraDevice
-from .base import PandoraEntity
-from .const import DOMAIN, ATTR_DEVICE_ATTR, ATTR_INVERSE, ATTR_IS_CONNECTION_SENSITIVE, ATTR_SHIFT_BITS
+from .base import PandoraEntity, async_setup_device_entities
+from .const import (
+    DOMAIN,
+    ATTR_DEVICE_ATTR,
+    ATTR_INVERSE,
+    ATTR_IS_CONNECTION_SENSITIVE,
+    ATTR_SHIFT_BITS,
+    ATTR_FEATURE,
+)
 
 
 _LOGGER = logging.getLogger(__name__)
@@ -109,6 +117,7 @@ ENTITY_CONFIGS = {
         ATTR_NAME: "coolant heater",
         ATTR_ICON: {True: "mdi:thermometer-plus", False: "mdi:thermometer"},
         ATTR_DEVICE_CLASS: None,
+        ATTR_FEATURE: "heater",
         ATTR_DEVICE_ATTR: "bit_state_1",
         ATTR_SHIFT_BITS: 29,
         ATTR_INVERSE: 0,
@@ -136,14 +145,9 @@ ENTITY_CONFIGS = {
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry, async_add_entities):
     """"""
 
-    api = hass.data[DOMAIN]
-
-    binary_sensors = []
-    for _, device in api.devices.items():
-        for entity_id, entity_config in ENTITY_CONFIGS.items():
-            binary_sensors.append(PandoraBinarySensorEntity(hass, device, entity_id, entity_config))
-
-    async_add_entities(binary_sensors, False)
+    async_setup_device_entities(
+        hass, entry, async_add_entities, BINARY_SENSOR_DOMAIN, PandoraBinarySensorEntity, ENTITY_CONFIGS
+    )
 
 
 class PandoraBinarySensorEntity(PandoraEntity, BinarySensorEntity):
@@ -206,10 +210,11 @@ class PandoraBinarySensorEntity(PandoraEntity, BinarySensorEntity):
             else:
                 expired = False
 
-            if self._state != state or self._expired != expired:
+            if self._state != state or self._expired != expired or self._stale != api.is_stale:
                 self._state = state
                 self._expired = expired
-                self.async_write_ha_state()
+                self._stale = api.is_stale
+                self._async_write_state()
         except KeyError:
             _LOGGER.warning("%s: can't get data from linked device", self.name)
 
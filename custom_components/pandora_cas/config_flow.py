@@ -12,24 +12,44 @@ from homeassistant import config_entries
 from homeassistant.config_entries import CONN_CLASS_CLOUD_POLL
 from homeassistant.const import CONF_PASSWORD, CONF_USERNAME
 from homeassistant.helpers.typing import ConfigType
+from yarl import URL
 
 from .const import (
     DOMAIN,
     CONF_POLLING_INTERVAL,
     DEFAULT_POLLING_INTERVAL,
     MIN_POLLING_INTERVAL,
+    CONF_MIN_WRITE_INTERVAL,
+    DEFAULT_MIN_WRITE_INTERVAL,
+    CONF_HOSTS,
+    DEFAULT_HOSTS,
+    CONF_MQTT_PREFIX,
+    DEFAULT_MQTT_PREFIX,
+    CONF_MQTT_QOS,
+    DEFAULT_MQTT_QOS,
     MILEAGE_SOURCES,
     OPTION_FUEL_UNITS,
     OPTION_MILEAGE_SOURCE,
     OPTION_MILEAGE_ADJUSTMENT,
     OPTION_EXPIRE_AFTER,
     FUEL_UNITS,
+    ATTR_DEVICE_ATTR,
+    ATTR_DEADBAND,
+    ATTR_HYSTERESIS,
 )
+from .sensor import ENTITY_CONFIGS as SENSOR_CONFIGS
 
 _LOGGER = logging.getLogger(__name__)
 
 PANDORA_ID = "pandora_id"
 
+# Default deadband and hysteresis of filtered sensors which can be overridden per device
+SENSOR_FILTERS = {
+    config[ATTR_DEVICE_ATTR]: (config.get(ATTR_DEADBAND, 0), config.get(ATTR_HYSTERESIS, 0))
+    for config in SENSOR_CONFIGS.values()
+    if ATTR_DEADBAND in config or ATTR_HYSTERESIS in config
+}
+
 FLOW_SCHEMA = vol.Schema(
     {vol.Required(CONF_USERNAME): str, vol.Required(CONF_PASSWORD): str, vol.Optional(CONF_POLLING_INTERVAL,): int,}
 )
@@ -47,6 +67,17 @@ def _base_schema(discovery_info=None):
                 vol.Required(
                     CONF_POLLING_INTERVAL, description={"suggested_value": discovery_info[CONF_POLLING_INTERVAL]}
                 ): int,
+                vol.Optional(
+                    CONF_MIN_WRITE_INTERVAL,
+                    default=discovery_info.get(CONF_MIN_WRITE_INTERVAL, DEFAULT_MIN_WRITE_INTERVAL),
+                ): vol.All(int, vol.Range(min=0)),
+                vol.Optional(CONF_HOSTS, default=discovery_info.get(CONF_HOSTS, DEFAULT_HOSTS)): str,
+                vol.Optional(
+                    CONF_MQTT_PREFIX, default=discovery_info.get(CONF_MQTT_PREFIX, DEFAULT_MQTT_PREFIX)
+                ): str,
+                vol.Optional(CONF_MQTT_QOS, default=discovery_info.get(CONF_MQTT_QOS, DEFAULT_MQTT_QOS)): vol.In(
+                    [0, 1, 2]
+                ),
             }
         )
     else:
@@ -57,12 +88,31 @@ def _base_schema(discovery_info=None):
                 vol.Required(
                     CONF_POLLING_INTERVAL, description={"suggested_value": DEFAULT_POLLING_INTERVAL.total_seconds()},
                 ): int,
+                vol.Optional(CONF_MIN_WRITE_INTERVAL, default=DEFAULT_MIN_WRITE_INTERVAL): vol.All(
+                    int, vol.Range(min=0)
+                ),
+                vol.Optional(CONF_HOSTS, default=DEFAULT_HOSTS): str,
+                vol.Optional(CONF_MQTT_PREFIX, default=DEFAULT_MQTT_PREFIX): str,
+                vol.Optional(CONF_MQTT_QOS, default=DEFAULT_MQTT_QOS): vol.In([0, 1, 2]),
             }
         )
 
     return vol.Schema(base_schema)
 
 
+class InvalidHost(Exception):
+    """Host isn't an absolute http(s) URL."""
+
+
+def _is_valid_host(host: str) -> bool:
+    """Check that the host is like https://p-on.ru."""
+    try:
+        url = URL(host)
+    except ValueError:
+        return False
+    return url.is_absolute() and url.scheme in ("http", "https") and bool(url.host)
+
+
 # pylint: disable=fixme
 async def validate_input(user_input: Optional[ConfigType] = None):
     """ TODO """
@@ -72,6 +122,10 @@ async def validate_input(user_input: Optional[ConfigType] = None):
     if user_input[CONF_POLLING_INTERVAL] < MIN_POLLING_INTERVAL.total_seconds():
         raise ValueError
 
+    hosts = [host.strip() for host in (user_input.get(CONF_HOSTS) or DEFAULT_HOSTS).split(",")]
+    if not all(_is_valid_host(host) for host in hosts):
+        raise InvalidHost
+
 
 @config_entries.HANDLERS.register("pandora_cas")
 class PandoraCasConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
@@ -99,6 +153,8 @@ class PandoraCasConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
                 await validate_input(user_input)
             except ValueError:
                 errors["base"] = "invalid_polling_interval"
+            except InvalidHost:
+                errors["base"] = "invalid_host"
 
             if "base" not in errors:
                 username = user_input[CONF_USERNAME]
@@ -126,6 +182,8 @@ class PandoraCasConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
                 await validate_input(user_input)
             except ValueError:
                 errors["base"] = "invalid_polling_interval"
+            except InvalidHost:
+                errors["base"] = "invalid_host"
 
             if "base" not in errors:
                 username = user_input[CONF_USERNAME]
@@ -172,6 +230,9 @@ class OptionsFlowHandler(config_entries.OptionsFlow):
             )
             device_options[self.pandora_id][OPTION_MILEAGE_ADJUSTMENT] = user_input.get(OPTION_MILEAGE_ADJUSTMENT, 0)
             device_options[self.pandora_id][OPTION_EXPIRE_AFTER] = user_input.get(OPTION_EXPIRE_AFTER, 0)
+            for attr, (deadband, hysteresis) in SENSOR_FILTERS.items():
+                device_options[self.pandora_id][attr + "_deadband"] = user_input.get(attr + "_deadband", deadband)
+                device_options[self.pandora_id][attr + "_hysteresis"] = user_input.get(attr + "_hysteresis", hysteresis)
             self.options.update(device_options)
             self.pandora_id = None  # invalidate pandora_id
             return self.async_create_entry(title="", data=self.options)
@@ -199,6 +260,17 @@ class OptionsFlowHandler(config_entries.OptionsFlow):
                 vol.Optional(OPTION_EXPIRE_AFTER, default=device_options.get(OPTION_EXPIRE_AFTER, 0))
             ] = vol.Coerce(int)
 
+        for attr, (deadband, hysteresis) in SENSOR_FILTERS.items():
+            if device_options is not None:
+                deadband = device_options.get(attr + "_deadband", deadband)
+                hysteresis = device_options.get(attr + "_hysteresis", hysteresis)
+            fields[vol.Optional(attr + "_deadband", default=deadband)] = vol.All(
+                vol.Coerce(float), vol.Range(min=0)
+            )
+            fields[vol.Optional(attr + "_hysteresis", default=hysteresis)] = vol.All(
+                vol.Coerce(float), vol.Range(min=0)
+            )
+
         return self.async_show_form(
             step_id="options",
             data_schema=vol.Schema(fields),
@@ -2,7 +2,15 @@
 
 from datetime import timedelta
 
-from homeassistant.const import PERCENTAGE, UnitOfVolume
+# Device options are shared with the client. Fuel units are equal to PERCENTAGE and UnitOfVolume.LITERS.
+from .pandora_client.const import (  # noqa: F401 pylint: disable=unused-import
+    FUEL_UNITS,
+    MILEAGE_SOURCES,
+    OPTION_FUEL_UNITS,
+    OPTION_MILEAGE_SOURCE,
+    OPTION_MILEAGE_ADJUSTMENT,
+    OPTION_EXPIRE_AFTER,
+)
 
 DOMAIN = "pandora_cas"
 
@@ -15,14 +23,36 @@ ATTR_FORMATTER = "formatter"
 ATTR_SCHEMA = "schema"
 ATTR_ID = "id"
 ATTR_COMMAND = "command"
+ATTR_COMMAND_ON = "command_on"
+ATTR_COMMAND_OFF = "command_off"
+ATTR_THROTTLED = "throttled"
+ATTR_DEADBAND = "deadband"
+ATTR_FEATURE = "feature"
+ATTR_PERMISSION = "permission"
+ATTR_NONZERO = "nonzero"
+ATTR_TOTAL = "total"
+ATTR_HYSTERESIS = "hysteresis"
+ATTR_START = "start"
+ATTR_END = "end"
+ATTR_FORMAT = "format"
+ATTR_FILENAME = "filename"
+ATTR_DURATION = "duration"
+ATTR_SPEED = "speed"
+
+SIGNAL_DEVICE_ADDED = DOMAIN + "_device_added"
+SIGNAL_TRACK_UPDATED = DOMAIN + "_track_updated_{}"
+EVENT_DRIVING = DOMAIN + "_driving"
 
 CONF_POLLING_INTERVAL = "polling_interval"
 MIN_POLLING_INTERVAL = timedelta(seconds=10)
 DEFAULT_POLLING_INTERVAL = timedelta(minutes=1)
+CONF_COALESCE_WRITES = "coalesce_writes"
+CONF_MIN_WRITE_INTERVAL = "min_write_interval"
+DEFAULT_MIN_WRITE_INTERVAL = 0
+CONF_HOSTS = "hosts"
+DEFAULT_HOSTS = "https://p-on.ru"
+CONF_MQTT_PREFIX = "mqtt_prefix"
+DEFAULT_MQTT_PREFIX = ""
+CONF_MQTT_QOS = "mqtt_qos"
+DEFAULT_MQTT_QOS = 0
 
-FUEL_UNITS = [PERCENTAGE, UnitOfVolume.LITERS]
-MILEAGE_SOURCES = ["GPS", "CAN"]
-OPTION_FUEL_UNITS = "fuel_units"
-OPTION_MILEAGE_SOURCE = "mileage_source"
-OPTION_MILEAGE_ADJUSTMENT = "mileage_adjustment"
-OPTION_EXPIRE_AFTER = "expire_after"
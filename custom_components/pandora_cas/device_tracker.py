@@ -9,15 +9,23 @@ from homeassistant.components.device_tracker import DOMAIN as PLATFORM_DOMAIN, S
 from homeassistant.components.device_tracker.config_entry import TrackerEntity
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
+from homeassistant.helpers.storage import Store
 from homeassistant.util import slugify
 
 
 from .api import PandoraDevice
-from .const import DOMAIN
+from .base import device_info
+from .const import DOMAIN, SIGNAL_DEVICE_ADDED, SIGNAL_TRACK_UPDATED
 
 
 _LOGGER = logging.getLogger(__name__)
 
+STORAGE_VERSION = 1
+STORAGE_KEY = DOMAIN + ".track_{}"
+SAVE_DELAY = 60
+
+
 # pylint: disable=unused-argument
 async def async_setup_entry(hass: HomeAssistant, config_entry: ConfigEntry, async_add_entities):
     """Set up the tracker."""
@@ -25,6 +33,12 @@ async def async_setup_entry(hass: HomeAssistant, config_entry: ConfigEntry, asyn
     api = hass.data[DOMAIN]
     tracker_ids = hass.states.async_entity_ids(PLATFORM_DOMAIN)
 
+    @callback
+    def _async_add_device(device: PandoraDevice) -> None:
+        async_add_entities([PandoraTrackerEntity(hass, device)], False)
+
+    config_entry.async_on_unload(async_dispatcher_connect(hass, SIGNAL_DEVICE_ADDED, _async_add_device))
+
     trackers = []
     for _, device in api.devices.items():
 
@@ -47,6 +61,7 @@ class PandoraTrackerEntity(TrackerEntity):
         self._device = device
         self._latitude = None
         self._longitude = None
+        self._store = Store(hass, STORAGE_VERSION, STORAGE_KEY.format(slugify(device.pandora_id)))
 
         self.entity_id = "{}.{}".format(PLATFORM_DOMAIN, slugify(device.pandora_id))
 
@@ -60,6 +75,11 @@ class PandoraTrackerEntity(TrackerEntity):
         """Return device name for this tracker entity."""
         return self._device.name
 
+    @property
+    def device_info(self):
+        """Unified device info dictionary."""
+        return device_info(self._device)
+
     @property
     def latitude(self):
         """Return latitude value of the device."""
@@ -87,13 +107,46 @@ class PandoraTrackerEntity(TrackerEntity):
 
     @callback
     def _update_callback(self, force=False):
-        """"""
-        if self._latitude != self._device.x or self._longitude != self._device.y:
-            self._latitude = self._device.x
-            self._longitude = self._device.y
+        """Write the current position and pass it through the track filter.
+
+        Only the stored track is compressed, the state always follows the device.
+        """
+        try:
+            latitude = self._device.x
+            longitude = self._device.y
+        except KeyError:
+            return
+
+        kept = self._device.track.append(
+            self._device.get("dtime") or self._device.timestamp,
+            latitude,
+            longitude,
+            self._device.get("speed", 0),
+            self._device.get("rot", 0),
+        )
+        if kept:
+            self._store.async_delay_save(self._device.track.as_dict, SAVE_DELAY)
+
+        if self._latitude != latitude or self._longitude != longitude:
+            self._latitude = latitude
+            self._longitude = longitude
             self.async_write_ha_state()
 
+    @callback
+    def _track_updated_callback(self):
+        """Save the track merged with the backfilled history."""
+        self._store.async_delay_save(self._device.track.as_dict, SAVE_DELAY)
+
     async def async_added_to_hass(self):
         """When entity is added to hass."""
+        data = await self._store.async_load()
+        if data:
+            self._device.track.restore(data)
+
         self.async_on_remove(self._hass.data[DOMAIN].async_add_listener(self._update_callback))
+        self.async_on_remove(
+            async_dispatcher_connect(
+                self._hass, SIGNAL_TRACK_UPDATED.format(self._device.pandora_id), self._track_updated_callback
+            )
+        )
         self._update_callback(True)
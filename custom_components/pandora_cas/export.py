@@ -0,0 +1,77 @@
+"""Streaming GPX/GeoJSON writers for device tracks.
+
+Documents are produced by generators chunk by chunk, so the whole export is never kept in memory.
+"""
+from datetime import datetime, timezone
+import json
+from xml.sax.saxutils import escape
+
+EXPORT_FORMATS = ["gpx", "geojson"]
+CHUNK_POINTS = 500
+
+
+def _iso(ts: int) -> str:
+    return datetime.fromtimestamp(ts, timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def _chunked(points, render):
+    """Render points and join them into chunks of CHUNK_POINTS."""
+    chunk = []
+    for point in points:
+        chunk.append(render(point))
+        if len(chunk) >= CHUNK_POINTS:
+            yield "".join(chunk)
+            chunk = []
+    if chunk:
+        yield "".join(chunk)
+
+
+def _gpx_point(point) -> str:
+    """GPX speed is in m/s. Course and speed exist only in GPX 1.0."""
+    return '<trkpt lat="{:.6f}" lon="{:.6f}"><time>{}</time><course>{}</course><speed>{:.2f}</speed></trkpt>\n'.format(
+        point[1], point[2], _iso(point[0]), point[4], point[3] / 3.6
+    )
+
+
+def gpx_chunks(name: str, points):
+    """Generate GPX document of the track."""
+    yield (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<gpx version="1.0" creator="pandora_cas" xmlns="http://www.topografix.com/GPX/1/0">\n'
+        "<trk><name>{}</name><trkseg>\n".format(escape(name))
+    )
+    yield from _chunked(points, _gpx_point)
+    yield "</trkseg></trk>\n</gpx>\n"
+
+
+def geojson_chunks(name: str, points):
+    """Generate GeoJSON FeatureCollection with one Point feature per track point."""
+    yield '{"type":"FeatureCollection","name":' + json.dumps(name) + ',"features":[\n'
+    first = True
+
+    def render(point):
+        nonlocal first
+        feature = json.dumps(
+            {
+                "type": "Feature",
+                "geometry": {"type": "Point", "coordinates": [point[2], point[1]]},
+                "properties": {"time": _iso(point[0]), "speed": point[3], "rot": point[4]},
+            },
+            separators=(",", ":"),
+        )
+        if first:
+            first = False
+            return feature
+        return ",\n" + feature
+
+    yield from _chunked(points, render)
+    yield "\n]}\n"
+
+
+def write_chunks(path: str, chunks) -> int:
+    """Write chunks to the file. Should be run in the executor. Returns written size."""
+    size = 0
+    with open(path, "w", encoding="utf-8") as file:
+        for chunk in chunks:
+            size += file.write(chunk)
+    return size
@@ -0,0 +1,79 @@
+"""Offline reverse geocoding against the local list of named places.
+
+Places are read from CSV file with name, latitude and longitude columns (e.g. exported from OSM).
+They are put into the grid index, so the lookup checks only cells around the position. Positions
+are quantized and results are kept in LRU cache, so the parked car doesn't cost anything.
+"""
+import csv
+from collections import defaultdict
+from functools import lru_cache
+import logging
+import math
+
+from .pandora_client.track import distance
+
+_LOGGER = logging.getLogger(__name__)
+
+PLACES_FILENAME = "pandora_cas_places.csv"
+
+GRID_SIZE = 0.01  # deg, cell of the index
+QUANTUM = 0.0005  # deg ~ 50 m, positions inside one quantum share the cache entry
+MAX_DISTANCE = 1000  # m, farther places aren't considered
+CACHE_SIZE = 4096
+
+METERS_PER_DEGREE = math.pi * 6371000 / 180
+
+
+class PandoraGeocoder:
+    """Nearest named place lookup. It's blocking, so it should run in the executor."""
+
+    def __init__(self, places: list) -> None:
+        """Constructor"""
+        self._cells = defaultdict(list)
+        for name, latitude, longitude in places:
+            self._cells[(math.floor(latitude / GRID_SIZE), math.floor(longitude / GRID_SIZE))].append(
+                (latitude, longitude, name)
+            )
+        self.count = len(places)
+        self.lookup_quantized = lru_cache(maxsize=CACHE_SIZE)(self._lookup)
+
+    @classmethod
+    def from_csv(cls, path: str):
+        """Read places from the file. Rows which can't be parsed (like header) are skipped."""
+        places = []
+        with open(path, newline="", encoding="utf-8") as file:
+            for row in csv.reader(file):
+                try:
+                    places.append((row[0].strip(), float(row[1]), float(row[2])))
+                except (IndexError, ValueError):
+                    continue
+        _LOGGER.info("Loaded %d places from %s", len(places), path)
+        return cls(places)
+
+    @staticmethod
+    def quantize(latitude: float, longitude: float) -> tuple:
+        """Cache key of the position."""
+        return round(latitude / QUANTUM), round(longitude / QUANTUM)
+
+    def lookup(self, latitude: float, longitude: float):
+        """Name of the nearest place within MAX_DISTANCE or None."""
+        return self.lookup_quantized(*self.quantize(latitude, longitude))
+
+    def _lookup(self, qlatitude: int, qlongitude: int):
+        latitude, longitude = qlatitude * QUANTUM, qlongitude * QUANTUM
+        row, column = math.floor(latitude / GRID_SIZE), math.floor(longitude / GRID_SIZE)
+        rows = math.ceil(MAX_DISTANCE / (GRID_SIZE * METERS_PER_DEGREE))
+        columns = math.ceil(
+            MAX_DISTANCE / (GRID_SIZE * METERS_PER_DEGREE * max(math.cos(math.radians(latitude)), 0.01))
+        )
+
+        nearest = None
+        nearest_distance = MAX_DISTANCE
+        for i in range(row - rows, row + rows + 1):
+            for j in range(column - columns, column + columns + 1):
+                for place_latitude, place_longitude, name in self._cells.get((i, j), ()):
+                    place_distance = distance(latitude, longitude, place_latitude, place_longitude)
+                    if place_distance <= nearest_distance:
+                        nearest = name
+                        nearest_distance = place_distance
+        return nearest
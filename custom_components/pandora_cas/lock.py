@@ -0,0 +1,71 @@
+"""
+Guard of the car as a lock entity.
+"""
+import logging
+
+from homeassistant.components.lock import DOMAIN as LOCK_DOMAIN, ENTITY_ID_FORMAT, LockEntity
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import ATTR_DEVICE_CLASS, ATTR_ICON, ATTR_NAME
+from homeassistant.core import HomeAssistant
+from homeassistant.util import slugify
+
+from .api import PandoraDevice
+from .base import PandoraCommandEntity, async_setup_device_entities
+from .const import (
+    ATTR_DEVICE_ATTR,
+    ATTR_SHIFT_BITS,
+    ATTR_PERMISSION,
+    ATTR_COMMAND_ON,
+    ATTR_COMMAND_OFF,
+)
+
+
+_LOGGER = logging.getLogger(__name__)
+
+
+ENTITY_CONFIGS = {
+    "guard": {
+        ATTR_NAME: "guard",
+        ATTR_ICON: None,
+        ATTR_DEVICE_CLASS: None,
+        ATTR_PERMISSION: "control",
+        ATTR_DEVICE_ATTR: "bit_state_1",
+        ATTR_SHIFT_BITS: 0,
+        ATTR_COMMAND_ON: "1",
+        ATTR_COMMAND_OFF: "2",
+    },
+}
+
+
+# pylint: disable=unused-argument
+async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry, async_add_entities):
+    """Set up the locks."""
+
+    async_setup_device_entities(hass, entry, async_add_entities, LOCK_DOMAIN, PandoraLockEntity, ENTITY_CONFIGS)
+
+
+class PandoraLockEntity(PandoraCommandEntity, LockEntity):
+    """Guard of the car."""
+
+    ENTITY_ID_FORMAT = ENTITY_ID_FORMAT
+
+    def __init__(
+        self, hass, device: PandoraDevice, entity_id: str, entity_config: dict,
+    ):
+        """Constructor."""
+        super().__init__(hass, device, entity_id, entity_config)
+
+        self.entity_id = self.ENTITY_ID_FORMAT.format("{}_{}".format(slugify(device.pandora_id), entity_id))
+
+    @property
+    def is_locked(self) -> bool:
+        """Return True if the car is under guard."""
+        return self._state
+
+    async def async_lock(self, **kwargs) -> None:
+        """Turn on the guard."""
+        await self._async_command(True)
+
+    async def async_unlock(self, **kwargs) -> None:
+        """Turn off the guard."""
+        await self._async_command(False)
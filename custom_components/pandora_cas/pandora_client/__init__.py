@@ -0,0 +1,20 @@
+"""Pandora Car Alarm System API client independent of Home Assistant.
+
+Run the standalone poller from the integration directory: python -m pandora_client --help
+"""
+
+from .api import (
+    PandoraApiCircuitOpen,
+    PandoraApiException,
+    PandoraApiRateLimited,
+    PandoraClient,
+    PandoraDevice,
+)
+
+__all__ = [
+    "PandoraApiCircuitOpen",
+    "PandoraApiException",
+    "PandoraApiRateLimited",
+    "PandoraClient",
+    "PandoraDevice",
+]
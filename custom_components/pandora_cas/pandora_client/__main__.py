@@ -0,0 +1,228 @@
+"""Standalone poller of Pandora accounts.
+
+Polls every account and emits changed attributes of devices as JSON lines to stdout or to every client
+connected to the Unix socket:
+
+    {"account": "user", "accounts": ["user"], "pandora_id": "1234", "ts": 1599696508, "changes": {"speed": 42.0}}
+
+The first line of every device contains all its attributes. Devices shared between accounts are polled
+once by the owning account, "accounts" lists all accounts which see the device.
+
+Socket clients can send commands as JSON lines. Every command goes through the account with the strongest
+permissions for the device and is answered to the sender only:
+
+    {"pandora_id": "1234", "command": "1"} -> {"pandora_id": "1234", "command": "1", "result": "ok"}
+"""
+
+import argparse
+import asyncio
+from functools import partial
+import json
+import logging
+import signal
+import sys
+
+from .api import BASE_URL, PandoraApiException, PandoraClient
+from .registry import PandoraDeviceRegistry
+
+_LOGGER = logging.getLogger(__name__)
+
+MIN_POLLING_INTERVAL = 10
+# Slow socket clients are disconnected instead of buffering the stream for them
+MAX_CLIENT_BUFFER = 1024 * 1024
+
+
+class StdoutSink:
+    """Writes lines to stdout."""
+
+    def emit(self, line: bytes) -> None:
+        """Write the line."""
+        sys.stdout.buffer.write(line)
+        sys.stdout.buffer.flush()
+
+    async def close(self) -> None:
+        """Nothing to close."""
+
+
+class UnixSocketSink:
+    """Broadcasts lines to all clients of the Unix socket and passes their lines to the command handler."""
+
+    def __init__(self, on_command=None) -> None:
+        self._server = None
+        self._writers = set()
+        self._on_command = on_command
+
+    async def start(self, path: str) -> None:
+        """Listen on the socket."""
+        self._server = await asyncio.start_unix_server(self._on_connect, path=path)
+        _LOGGER.info("Listening on %s", path)
+
+    async def _on_connect(self, reader, writer) -> None:
+        self._writers.add(writer)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if self._on_command is not None and line.strip():
+                    response = await self._on_command(line)
+                    writer.write(json.dumps(response, ensure_ascii=False).encode() + b"\n")
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+
+    def emit(self, line: bytes) -> None:
+        """Write the line to every client."""
+        for writer in list(self._writers):
+            if writer.transport.get_write_buffer_size() > MAX_CLIENT_BUFFER:
+                _LOGGER.warning("Client is too slow, disconnecting")
+                self._writers.discard(writer)
+                writer.close()
+                continue
+            writer.write(line)
+
+    async def close(self) -> None:
+        """Stop listening and disconnect clients."""
+        for writer in self._writers:
+            writer.close()
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+
+async def load_account(client: PandoraClient, interval: int) -> None:
+    """Load devices, retry until success."""
+    while True:
+        try:
+            await client.load_devices()
+            return
+        except PandoraApiException as ex:
+            _LOGGER.error("Loading devices of %s failed: %s", client.username, str(ex))
+            await asyncio.sleep(interval)
+
+
+def emit_changes(client: PandoraClient, registry: PandoraDeviceRegistry, sink) -> None:
+    """Emit changes of the last update of the account."""
+    for pandora_id, delta in client.changes.items():
+        line = {
+            "account": client.username,
+            "accounts": [shared.username for shared in registry.clients(pandora_id)],
+            "pandora_id": pandora_id,
+            "ts": client.timestamp,
+            "changes": delta,
+        }
+        sink.emit(json.dumps(line, ensure_ascii=False).encode() + b"\n")
+
+
+async def poll_account(client: PandoraClient, registry: PandoraDeviceRegistry, interval: int, sink) -> None:
+    """Poll the account. Changes are emitted by the listener, so dense polls after commands are emitted too."""
+    remove_listener = client.async_add_listener(partial(emit_changes, client, registry, sink))
+    try:
+        while True:
+            await client.async_refresh()
+            await asyncio.sleep(interval)
+    finally:
+        remove_listener()
+
+
+def read_accounts(args) -> list:
+    """Accounts from arguments and the file as (username, password) pairs."""
+    entries = list(args.account or [])
+    if args.accounts_file:
+        with open(args.accounts_file, encoding="utf-8") as file:
+            entries.extend(line.strip() for line in file if line.strip() and not line.startswith("#"))
+
+    accounts = []
+    for entry in entries:
+        username, sep, password = entry.partition(":")
+        if not sep:
+            raise ValueError("Account must be USERNAME:PASSWORD")
+        accounts.append((username, password))
+    return accounts
+
+
+async def execute_command(registry: PandoraDeviceRegistry, line: bytes) -> dict:
+    """Execute the command line of the socket client through the registry."""
+    try:
+        request = json.loads(line)
+        pandora_id = str(request["pandora_id"])
+        command = str(request["command"])
+    except (ValueError, KeyError, TypeError):
+        return {"error": "Command must be like {\"pandora_id\": \"1234\", \"command\": \"1\"}"}
+
+    response = {"pandora_id": pandora_id, "command": command}
+    if pandora_id not in registry.devices:
+        response["error"] = "Unknown PANDORA_ID"
+        return response
+
+    try:
+        await registry.async_command(pandora_id, command)
+        response["result"] = "ok"
+    except PandoraApiException as ex:
+        response["error"] = str(ex)
+    return response
+
+
+async def run(args) -> None:
+    """Poll all accounts until interrupted."""
+    clients = [
+        PandoraClient(username, password, args.interval, args.host or [BASE_URL])
+        for username, password in read_accounts(args)
+    ]
+    registry = PandoraDeviceRegistry()
+
+    if args.socket:
+        sink = UnixSocketSink(partial(execute_command, registry))
+        await sink.start(args.socket)
+    else:
+        sink = StdoutSink()
+
+    async def _run() -> None:
+        await asyncio.gather(*(load_account(client, args.interval) for client in clients))
+        for client in clients:
+            registry.attach(client)
+        await asyncio.gather(*(poll_account(client, registry, args.interval, sink) for client in clients))
+
+    task = asyncio.ensure_future(_run())
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, task.cancel)
+
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+    finally:
+        for client in clients:
+            registry.detach(client)
+            await client.async_close()
+        await sink.close()
+
+
+def main() -> None:
+    """Entry point."""
+    parser = argparse.ArgumentParser(prog="python -m pandora_client", description=__doc__.split("\n")[0])
+    parser.add_argument("-a", "--account", action="append", help="USERNAME:PASSWORD, can be repeated")
+    parser.add_argument("-f", "--accounts-file", help="file with USERNAME:PASSWORD lines")
+    parser.add_argument("-i", "--interval", type=int, default=60, help="polling interval, seconds (default: 60)")
+    parser.add_argument("--host", action="append", help="API base URL, can be repeated (default: %s)" % BASE_URL)
+    parser.add_argument("-s", "--socket", help="emit to clients of the Unix socket instead of stdout")
+    parser.add_argument("-v", "--verbose", action="store_true", help="debug logging")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.DEBUG if args.verbose else logging.INFO, stream=sys.stderr, format="%(asctime)s %(message)s"
+    )
+    args.interval = max(args.interval, MIN_POLLING_INTERVAL)
+
+    try:
+        if not read_accounts(args):
+            parser.error("at least one account is required")
+    except (OSError, ValueError) as ex:
+        parser.error(str(ex))
+
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
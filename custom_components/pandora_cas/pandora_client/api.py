@@ -0,0 +1,1533 @@
+"""Pandora Car Alarm System API client.
+
+It doesn't depend on Home Assistant, so it can be used by the standalone poller as well.
+"""
+
+import asyncio
+from functools import partial
+from itertools import product
+import json
+import logging
+import random
+import sys
+from json import JSONDecodeError
+from time import monotonic, time
+from typing import Callable
+
+import aiohttp
+from yarl import URL
+
+from .const import (
+    MILEAGE_SOURCES,
+    OPTION_FUEL_UNITS,
+    OPTION_MILEAGE_SOURCE,
+    OPTION_MILEAGE_ADJUSTMENT,
+    OPTION_EXPIRE_AFTER,
+    FUEL_UNITS,
+)
+from .driving import PandoraDrivingDetector
+from .history import PandoraHistory
+from .metrics import PandoraClientMetrics, render_metrics
+from .recorder import PandoraReplaySession, PandoraTrafficRecorder, read_records
+from .snapshot import PandoraFleetSnapshot
+from .totals import PandoraTotals
+from .track import PandoraTrack
+
+
+_LOGGER = logging.getLogger(__name__)
+
+
+HOST = "p-on.ru"
+BASE_URL = "https://" + HOST
+LOGIN_PATH = "/api/users/login"
+DEVICES_PATH = "/api/devices"
+UPDATE_PATH = "/api/updates?ts="
+COMMAND_PATH = "/api/devices/command"
+TRACK_PATH = "/api/tracks/data"
+EVENTS_PATH = "/api/lenta"
+
+USER_AGENT = "Mozilla/5.0 (X11; Fedora; Linux x86_64; rv:79.0) Gecko/20100101 Firefox/79.0"
+
+FORCE_UPDATE_INTERVAL = 300
+DEVICES_REFRESH_INTERVAL = 3600
+DEVICE_REMOVE_AFTER = 3  # device list refreshes in a row the device is missing from
+DENSE_POLLING_INTERVAL = 1
+COMMAND_RESPONSE_TIMEOUT = 35
+
+SESSION_ERRORS = {"Session is expired", "Invalid session", "sid-expired"}
+
+# Total time budget of the request in seconds including relogin and retries
+REQUEST_BUDGETS = {"login": 15, "devices": 20, "updates": 15, "command": 15, "data": 30, "lenta": 30}
+
+# Request priorities, the lower the more important
+PRIORITY_COMMAND = 0
+PRIORITY_DENSE = 1
+PRIORITY_ROUTINE = 2
+PRIORITY_BACKFILL = 3
+
+# Token bucket shared by all requests of the account. Less important requests have to leave
+# some tokens in the bucket, so commands never wait for polling.
+RATE_LIMIT_RATE = 2  # tokens per second
+RATE_LIMIT_BURST = 10
+RATE_LIMIT_RESERVE = {PRIORITY_COMMAND: 0, PRIORITY_DENSE: 2, PRIORITY_ROUTINE: 4, PRIORITY_BACKFILL: 6}
+
+CIRCUIT_FAILURE_THRESHOLD = 3
+CIRCUIT_BASE_DELAY = 30
+CIRCUIT_MAX_DELAY = 1800
+
+# Updates resumed after the longer pause leave a gap which should be backfilled
+GAP_THRESHOLD = 600  # s
+# History is fetched in time chunks, a few at once. Every chunk is paginated.
+BACKFILL_CHUNK = 3600  # s
+BACKFILL_CONCURRENCY = 3
+BACKFILL_PAGE_SIZE = 500
+
+HOST_SMOOTHING = 0.2  # weight of the last sample in RTT and error rate averages
+HOST_ERROR_PENALTY = 10  # host failing all requests looks 10 times slower
+HOST_PROBE_RATIO = 0.05  # share of routine requests sent to random hosts to keep their stats fresh
+
+
+class PandoraApiException(Exception):
+    """An exception class of Pandora API."""
+
+
+class PandoraApiCircuitOpen(PandoraApiException):
+    """Request is rejected because the server is considered down."""
+
+
+class PandoraApiRateLimited(PandoraApiException):
+    """Request is dropped by the rate limiter."""
+
+
+def _decode(body: bytes, parser=None):
+    """Decode JSON response and normalize it with the parser.
+
+    Error responses are returned as is, so the caller can handle them.
+    """
+    j = json.loads(body)
+    if parser is None or isinstance(j, dict) and j.get("status") in SESSION_ERRORS | {"fail"}:
+        return j
+    return parser(j)
+
+
+def _endpoint(path: str) -> str:
+    """Short name of the endpoint: "/api/updates?ts=1" -> "updates"."""
+    return path.split("?")[0].rsplit("/", 1)[-1]
+
+
+class PandoraRateLimiter:
+    """Token bucket with priorities.
+
+    Commands wait for a token (within their deadline), polls are dropped when the bucket is empty.
+    Backfill waits too, but only till the reserve of other priorities is refilled.
+    """
+
+    def __init__(self, rate: float = RATE_LIMIT_RATE, burst: int = RATE_LIMIT_BURST) -> None:
+        """Constructor"""
+        self._rate = rate
+        self._burst = burst
+        self._tokens = float(burst)
+        self._updated = monotonic()
+        self.dropped = 0
+
+    def _refill(self) -> None:
+        now = monotonic()
+        self._tokens = min(self._burst, self._tokens + (now - self._updated) * self._rate)
+        self._updated = now
+
+    def wait_time(self, priority: int) -> float:
+        """Seconds till the request of the priority can get a token."""
+        self._refill()
+        return max(0.0, (1 + RATE_LIMIT_RESERVE[priority] - self._tokens) / self._rate)
+
+    async def acquire(self, priority: int, timeout: float) -> None:
+        """Take a token or raise PandoraApiRateLimited."""
+        self._refill()
+
+        if priority == PRIORITY_BACKFILL:
+            # Concurrent waiters race for the token, the losers just wait again
+            wait = self.wait_time(priority)
+            while wait > 0:
+                if wait > timeout:
+                    self.dropped += 1
+                    raise PandoraApiRateLimited("Rate limit exceeded")
+                await asyncio.sleep(wait)
+                timeout -= wait
+                wait = self.wait_time(priority)
+
+        if self._tokens >= 1 + RATE_LIMIT_RESERVE[priority]:
+            self._tokens -= 1
+            return
+
+        wait = (1 - self._tokens) / self._rate
+        if priority != PRIORITY_COMMAND or wait > timeout:
+            self.dropped += 1
+            raise PandoraApiRateLimited("Rate limit exceeded")
+
+        # Token is taken in advance (bucket goes negative), so concurrent commands queue up behind
+        self._tokens -= 1
+        await asyncio.sleep(wait)
+
+
+class PandoraCircuitBreaker:
+    """Circuit breaker for requests to the server.
+
+    After CIRCUIT_FAILURE_THRESHOLD transport failures in a row the circuit opens and requests are
+    rejected locally. When the delay expires a single probe request is allowed (half-open). Successful
+    probe closes the circuit, failed one reopens it with doubled and jittered delay.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD,
+        base_delay: int = CIRCUIT_BASE_DELAY,
+        max_delay: int = CIRCUIT_MAX_DELAY,
+    ) -> None:
+        """Constructor"""
+        self._failure_threshold = failure_threshold
+        self._base_delay = base_delay
+        self._max_delay = max_delay
+        self._delay = base_delay
+        self._retry_at = 0.0
+        self.state = self.CLOSED
+        self.failures = 0
+
+    @property
+    def retry_in(self) -> float:
+        """Seconds till the next probe."""
+        return max(0.0, self._retry_at - monotonic()) if self.state == self.OPEN else 0.0
+
+    def allow(self) -> bool:
+        """Check if request may be sent now."""
+        if self.state == self.CLOSED:
+            return True
+
+        if self.state == self.OPEN and monotonic() >= self._retry_at:
+            _LOGGER.info("Circuit is half-open. Probing the server")
+            self.state = self.HALF_OPEN
+            return True
+
+        # Open, or half-open with the probe in flight
+        return False
+
+    def record_success(self) -> None:
+        """Server responded."""
+        if self.state != self.CLOSED:
+            _LOGGER.info("Circuit is closed. Server is available again")
+        self.state = self.CLOSED
+        self.failures = 0
+        self._delay = self._base_delay
+
+    def record_failure(self) -> None:
+        """Server didn't respond properly."""
+        self.failures += 1
+
+        if self.state == self.HALF_OPEN:
+            self._delay = min(self._delay * 2, self._max_delay)
+        elif self.failures < self._failure_threshold:
+            return
+
+        self.state = self.OPEN
+        self._retry_at = monotonic() + random.uniform(self._delay / 2, self._delay)
+        _LOGGER.warning("Circuit is open after %d failures. Next probe in %d s", self.failures, self.retry_in)
+
+    def release(self) -> None:
+        """Request was cancelled before completion. Let the next request probe the server."""
+        if self.state == self.HALF_OPEN:
+            self.state = self.OPEN
+            self._retry_at = monotonic()
+
+
+class PandoraHostSelector:
+    """Picks the healthiest API host by RTT and error rate measured on normal traffic.
+
+    Hosts without measurements are tried first.
+    """
+
+    def __init__(self, hosts: list) -> None:
+        """Constructor"""
+        self.hosts = [host.rstrip("/") for host in hosts]
+        self.rtt = dict.fromkeys(self.hosts, 0.0)
+        self.error_rate = dict.fromkeys(self.hosts, 0.0)
+
+    def _score(self, host: str) -> float:
+        return self.rtt[host] * (1 + HOST_ERROR_PENALTY * self.error_rate[host])
+
+    def select(self, exclude=(), probe: bool = False):
+        """Return the best host which isn't excluded or None. Probe picks a random host sometimes."""
+        candidates = [host for host in self.hosts if host not in exclude]
+        if not candidates:
+            return None
+        if probe and len(candidates) > 1 and random.random() < HOST_PROBE_RATIO:
+            return random.choice(candidates)
+        return min(candidates, key=self._score)
+
+    def record(self, host: str, rtt: float, success: bool) -> None:
+        """Account the result of the request to the host."""
+        self.rtt[host] = rtt if not self.rtt[host] else self.rtt[host] + HOST_SMOOTHING * (rtt - self.rtt[host])
+        self.error_rate[host] += HOST_SMOOTHING * ((not success) - self.error_rate[host])
+
+
+class PandoraClient:
+    """Pandora API client of one account.
+
+    Session is created on the first login unless it's given.
+    """
+
+    def __init__(
+        self, username: str, password: str, polling_interval: int, hosts: list = None, session=None
+    ) -> None:
+        """Constructor"""
+        self._username = username
+        self._password = password
+        self._session = session
+        self._owns_session = session is None
+        self._polling_interval = polling_interval
+        self._session_id = None
+        self._update_ts = 0
+        self._force_update_ts = 0
+        self._command_response = asyncio.Event()
+        self._dense_poll = False
+        self._devices = {}
+        self._snapshot = PandoraFleetSnapshot()
+        self._breaker = PandoraCircuitBreaker()
+        self._limiter = PandoraRateLimiter()
+        self._hosts = PandoraHostSelector(hosts or [BASE_URL])
+        self._update_in_progress = False
+        self._command_predicate = None
+        self._recorder = None
+        self._timeouts = dict.fromkeys(REQUEST_BUDGETS, 0)
+        self._metrics = PandoraClientMetrics()
+        self._metrics_text = None
+        self._changes = {}
+        self._skipped = set()
+        self._missing = {}
+        self._last_update_time = None
+        self._gaps = []
+        self._inflight = set()
+        self._dense_poll_cancel = None
+        self._listeners = []
+        self._closed = False
+
+    @property
+    def username(self) -> str:
+        """Account name."""
+
+        return self._username
+
+    @property
+    def devices(self) -> dict:
+        """Accessor"""
+
+        return self._devices
+
+    @property
+    def snapshot(self) -> PandoraFleetSnapshot:
+        """Columnar snapshot of all devices."""
+
+        return self._snapshot
+
+    @property
+    def circuit_breaker(self) -> PandoraCircuitBreaker:
+        """Circuit breaker of requests to the server."""
+
+        return self._breaker
+
+    @property
+    def rate_limiter(self) -> PandoraRateLimiter:
+        """Rate limiter shared by all requests."""
+
+        return self._limiter
+
+    @property
+    def host_selector(self) -> PandoraHostSelector:
+        """Health of API hosts."""
+
+        return self._hosts
+
+    @property
+    def is_stale(self) -> bool:
+        """Data isn't refreshed because the server is considered down."""
+
+        return self._breaker.state != PandoraCircuitBreaker.CLOSED
+
+    @property
+    def timeouts(self) -> dict:
+        """Number of timed out requests per endpoint."""
+
+        return self._timeouts
+
+    @property
+    def changes(self) -> dict:
+        """Changed attributes of devices in the last update: {PANDORA_ID: {attribute: value}}."""
+
+        return self._changes
+
+    @property
+    def metrics(self) -> PandoraClientMetrics:
+        """Counters of requests."""
+
+        return self._metrics
+
+    def metrics_text(self) -> bytes:
+        """Prometheus metrics. They're rendered once per update and cached between scrapes."""
+
+        if self._metrics_text is None:
+            self._metrics_text = render_metrics(self)
+        return self._metrics_text
+
+    @property
+    def timestamp(self) -> int:
+        """Get last update timestamp."""
+
+        return self._update_ts
+
+    def _create_session(self):
+        """Create HTTP session on the first login."""
+        return aiohttp.ClientSession()
+
+    async def _async_add_executor_job(self, target, *args):
+        """Run blocking function in the executor."""
+        return await asyncio.get_running_loop().run_in_executor(None, target, *args)
+
+    async def _send(self, method, url, data, headers, timeout) -> tuple:
+        """Send the request and read the response status and body."""
+
+        async with self._session.request(
+            method, url, data=data, headers=headers, timeout=aiohttp.ClientTimeout(total=timeout)
+        ) as response:
+            body = await response.read()
+            if _LOGGER.isEnabledFor(logging.DEBUG):
+                _LOGGER.debug("Response Code: %d, Body: %s", response.status, body.decode(errors="replace"))
+            return response.status, body
+
+    async def _request(self, path, method="GET", data=None, deadline=None, priority=PRIORITY_ROUTINE, parser=None):
+        """Request an information from server.
+
+        The request must complete before the deadline (event loop time). By default it's the budget of the endpoint.
+        Successful response is normalized with the parser.
+        """
+
+        # Heve to do it here because async_create_clientsession uses self User-Agent which rejects by p-on.ru
+        headers = {"User-Agent": USER_AGENT}
+        endpoint = _endpoint(path)
+
+        if self._closed:
+            raise PandoraApiException("API is closed")
+
+        if deadline is None:
+            deadline = monotonic() + REQUEST_BUDGETS.get(endpoint, REQUEST_BUDGETS["updates"])
+
+        # Checked before the rate limiter, so rejected requests don't take tokens
+        if not self._breaker.allow():
+            raise PandoraApiCircuitOpen("Circuit is open, next probe in %d s" % self._breaker.retry_in)
+
+        try:
+            return await self._request_allowed(path, method, data, headers, endpoint, deadline, priority, parser)
+        except BaseException:
+            # Outcome of the probe wasn't recorded (cancelled, rate limited or unexpected error).
+            # Let the next request probe the server instead of staying half-open forever.
+            self._breaker.release()
+            raise
+
+    async def _request_allowed(self, path, method, data, headers, endpoint, deadline, priority, parser):
+        """Request allowed by the circuit breaker."""
+
+        await self._limiter.acquire(priority, deadline - monotonic())
+
+        if deadline <= monotonic():
+            self._timeouts[endpoint] = self._timeouts.get(endpoint, 0) + 1
+            raise PandoraApiException("Deadline exceeded")
+
+        # GET requests fail over to the next healthiest host, so the first attempt leaves time for the second one.
+        # POST requests (login, commands) aren't repeated as they could be already delivered.
+        tried = []
+        while True:
+            host = self._hosts.select(tried, probe=priority == PRIORITY_ROUTINE)
+            tried.append(host)
+            can_fail_over = method == "GET" and len(tried) < len(self._hosts.hosts)
+            timeout = deadline - monotonic()
+            if can_fail_over:
+                timeout /= 2
+
+            url = host + path
+            _LOGGER.debug("Request: %s", url)
+
+            # Request runs in its own task, so it can be cancelled on unload without touching the caller
+            started = monotonic()
+            task = asyncio.ensure_future(self._send(method, url, data, headers, timeout))
+            self._inflight.add(task)
+            try:
+                status, body = await task
+                rtt = monotonic() - started
+            # Request didn't fit into the deadline or connection related error
+            except (asyncio.TimeoutError, aiohttp.ClientConnectionError) as ex:
+                self._hosts.record(host, monotonic() - started, False)
+                if can_fail_over:
+                    _LOGGER.info("Request to %s failed: %s. Failing over", host, type(ex).__name__)
+                    continue
+                self._breaker.record_failure()
+                self._metrics.failure(endpoint)
+                if isinstance(ex, asyncio.TimeoutError):
+                    self._timeouts[endpoint] = self._timeouts.get(endpoint, 0) + 1
+                    raise PandoraApiException("Timeout") from None
+                raise PandoraApiException(type(ex).__name__) from None
+            # Response related error (bad status, broken payload and so on)
+            except aiohttp.ClientError as ex:
+                self._hosts.record(host, monotonic() - started, False)
+                self._breaker.record_failure()
+                self._metrics.failure(endpoint)
+                raise PandoraApiException(type(ex).__name__) from None
+            except asyncio.CancelledError:
+                if self._closed:
+                    raise PandoraApiException("Request cancelled") from None
+                raise
+            finally:
+                self._inflight.discard(task)
+
+            self._metrics.observe(endpoint, rtt)
+            if self._recorder is not None:
+                self._recorder.record(
+                    {
+                        "time": time(),
+                        "method": method,
+                        "path": path,
+                        "data": data,
+                        "status": status,
+                        "elapsed": round(rtt, 3),
+                        "body": body,
+                    }
+                )
+
+            # Server errors and broken responses count against the host like connection errors.
+            # Decoded on the event loop, the executor doesn't help as json.loads holds the GIL (bench_decode.py).
+            error = None
+            if status >= 500:
+                error = "Server error %d" % status
+            else:
+                try:
+                    j = _decode(body, parser)
+                except (JSONDecodeError, UnicodeDecodeError):
+                    error = "JSON decode error"
+
+            if error is not None:
+                self._hosts.record(host, rtt, False)
+                if can_fail_over:
+                    _LOGGER.info("Request to %s failed: %s. Failing over", host, error)
+                    continue
+                self._breaker.record_failure()
+                self._metrics.failure(endpoint)
+                raise PandoraApiException(error)
+
+            self._hosts.record(host, rtt, True)
+            break
+
+        # Server is alive even if it reports a failure below
+        self._breaker.record_success()
+
+        # We can get "status":"fail" in critical cases, so just raise an exception
+        if isinstance(j, dict) and j.get("status") == "fail":
+            self._metrics.failure(endpoint)
+            raise PandoraApiException(str(j["error_text"]))
+
+        return j
+
+    async def login(self, deadline=None, priority=PRIORITY_ROUTINE) -> None:
+        """Login on server."""
+
+        if self._session is None:
+            self._session = self._create_session()
+
+        data = {"login": self._username, "password": self._password, "lang": "ru"}
+
+        response = await self._request(
+            LOGIN_PATH,
+            method="POST",
+            data=data,
+            deadline=deadline,
+            priority=priority,
+            parser=PandoraApiLoginResponseParser,
+        )
+        # _session_id isn't used now
+        self._session_id = response.session_id
+
+        # Share the session cookies with all hosts, so failover doesn't require relogin
+        cookie_jar = getattr(self._session, "cookie_jar", None)
+        if cookie_jar is not None:
+            cookies = {}
+            for host in self._hosts.hosts:
+                cookies.update((key, morsel.value) for key, morsel in cookie_jar.filter_cookies(URL(host)).items())
+            for host in self._hosts.hosts:
+                cookie_jar.update_cookies(cookies, URL(host))
+
+        _LOGGER.info("Login successful")
+
+    async def _request_safe(
+        self, path, method="GET", data=None, relogin=False, deadline=None, priority=PRIORITY_ROUTINE, parser=None
+    ):
+        """ High-level request function.
+
+        It will make login on server if it isn't done before.
+        It also checks the expiration/validity of the cookies. If problems - tries to make relogin.
+        Login and retries share the deadline of the original request.
+        """
+
+        if deadline is None:
+            deadline = monotonic() + REQUEST_BUDGETS.get(_endpoint(path), REQUEST_BUDGETS["updates"])
+
+        if not self._session or relogin:
+            self._session_id = None
+            await self.login(deadline, priority)
+
+        response = await self._request(
+            path, method=method, data=data, deadline=deadline, priority=priority, parser=parser
+        )
+
+        if isinstance(response, dict) and "status" in response:
+            if response["status"] in SESSION_ERRORS:
+                _LOGGER.info("PandoraApi: %s. Making relogin.", response["error_text"])
+                self._metrics.relogins += 1
+                response = await self._request_safe(
+                    path, method=method, data=data, relogin=True, deadline=deadline, priority=priority, parser=parser
+                )
+
+        return response
+
+    async def load_devices(self):
+        """Load device list.
+
+        It shoud be done next after constructor.
+        """
+
+        response = await self._request_safe(DEVICES_PATH, parser=PandoraApiDevicesResponseParser)
+
+        for pandora_id, info in response.devices.items():
+            self._devices[pandora_id] = PandoraDevice(pandora_id, info)
+
+    async def async_refresh_devices(self) -> tuple:
+        """Reload device list and apply the difference to known devices.
+
+        Returns lists of added devices, removed devices and devices which metadata has changed.
+        """
+
+        response = await self._request_safe(DEVICES_PATH, parser=PandoraApiDevicesResponseParser)
+
+        added = []
+        updated = []
+        for pandora_id, info in response.devices.items():
+            device = self._devices.get(pandora_id)
+            if device is None:
+                device = self._devices[pandora_id] = PandoraDevice(pandora_id, info)
+                added.append(device)
+            elif device.update_info(info):
+                updated.append(device)
+
+        # Devices are removed only after missing from several lists in a row, so a partial response doesn't
+        # wipe them. Empty list is considered a server glitch rather than an account without cars.
+        missing = set(self._devices) - set(response.devices) if response.devices else set()
+        self._missing = {pandora_id: self._missing.get(pandora_id, 0) + 1 for pandora_id in missing}
+        removed = [
+            self._devices.pop(pandora_id) for pandora_id, count in self._missing.items() if count >= DEVICE_REMOVE_AFTER
+        ]
+        for device in removed:
+            del self._missing[device.pandora_id]
+        if removed:
+            # Snapshot indexes are allocated sequentially, so rebuild it instead of leaving holes
+            self._snapshot = PandoraFleetSnapshot()
+            self._snapshot.update(self._devices, self._update_ts)
+
+        for device in removed:
+            _LOGGER.info("Device %s (PANDORA_ID=%s) removed", device.name, device.pandora_id)
+
+        return added, removed, updated
+
+    @property
+    def last_update_time(self):
+        """Wall clock time of the last successful update."""
+
+        return self._last_update_time
+
+    def restore_last_update_time(self, last_update_time: float) -> None:
+        """Set the time of the last update before restart, so the downtime is detected as a gap."""
+        if self._last_update_time is None:
+            self._last_update_time = last_update_time
+
+    def pop_gaps(self) -> list:
+        """Take detected gaps between updates: [(start, end)]."""
+        gaps, self._gaps = self._gaps, []
+        return gaps
+
+    def skip_device(self, pandora_id: str, skip: bool = True) -> None:
+        """Don't apply updates of the device, it's updated through another account."""
+        if skip:
+            self._skipped.add(pandora_id)
+        else:
+            self._skipped.discard(pandora_id)
+
+    async def async_update(self, *_) -> dict:
+        """Update attributes of devices.
+
+        Returns changed attributes of updated devices: {PANDORA_ID: {attribute: value}}.
+        Skipped devices are updated only while a command is awaited.
+        """
+        changes = {}
+
+        # Nothing to poll, all devices are updated through other accounts
+        if self._devices and self._skipped >= self._devices.keys() and not self._dense_poll:
+            self._changes = changes
+            return changes
+
+        # Routine and dense polls may overlap. The second one is merged into the update in progress.
+        if self._update_in_progress:
+            _LOGGER.debug("Update is merged with the one in progress")
+            self._changes = changes
+            return changes
+
+        self._update_in_progress = True
+        priority = PRIORITY_DENSE if self._dense_poll else PRIORITY_ROUTINE
+        # States of skipped devices aren't even parsed, unless a command is awaited
+        parser = PandoraApiUpdateResponseParser
+        if self._skipped and not self._dense_poll:
+            parser = partial(PandoraApiUpdateResponseParser, skip=frozenset(self._skipped))
+
+        try:
+            if self._update_ts >= self._force_update_ts + FORCE_UPDATE_INTERVAL:
+                self._update_ts = 0
+
+            response = await self._request_safe(
+                UPDATE_PATH + str(self._update_ts - 1), priority=priority, parser=parser
+            )
+
+            stats = response.stats
+            if self._update_ts == 0:
+                self._force_update_ts = response.timestamp
+            self._update_ts = response.timestamp
+
+            # UCR means that device received the command and sent response (user command response?)
+            # Lot's of commands executes quick: like on/off tracking, ext. cannel and so on.
+            # And only engine_start requires additional 10-15 seconds on device side.
+            # Commands with a predicate complete only when the device state really changes.
+            if response.ucr is not None and self._command_predicate is None:
+                self._command_response.set()
+
+            try:
+                for pandora_id, attrs in stats.items():
+                    delta = await self._devices[pandora_id].update(attrs, response.time[pandora_id]["online"])
+                    if delta:
+                        changes[pandora_id] = delta
+            except KeyError:
+                _LOGGER.info("Got data for unexpected PANDORA_ID '%s'. Skipping...", pandora_id)
+
+            # Trips of parked cars end by timeout, they usually don't report anything
+            now = time()
+            for device in self._devices.values():
+                device.driving.check_timeout(now)
+
+            if self._command_predicate is not None:
+                pandora_id, predicate = self._command_predicate
+                device = self._devices.get(pandora_id)
+                try:
+                    if device is not None and predicate(device):
+                        self._command_response.set()
+                except KeyError:
+                    # Attribute of the predicate wasn't received yet
+                    pass
+
+            self._snapshot.update(self._devices, self._update_ts)
+
+            if self._last_update_time is not None and now - self._last_update_time > GAP_THRESHOLD:
+                self._gaps.append((int(self._last_update_time), int(now)))
+            self._last_update_time = now
+
+        except (PandoraApiCircuitOpen, PandoraApiRateLimited) as ex:
+            _LOGGER.debug("Update skipped: %s", str(ex))
+        except PandoraApiException as ex:
+            _LOGGER.info("Update failed: %s", str(ex))
+        finally:
+            self._update_in_progress = False
+            self._metrics_text = None
+
+        # I made some experiments with my car. How long does it take between sending command
+        # and getting proper state of corresponding entity?  Results is placed below:
+        # ----------------------------------------------------------------------------------
+        # Stop engine: about 10s
+        # Start engine: about 25s
+        # ----------------------------------------------------------------------------------
+        # Pandora makes one request per second until ucr receives. Timeout - 35 seconds
+
+        if self._dense_poll > 0 and not self._closed:
+            self._dense_poll -= 1
+            self._schedule_dense_poll()
+
+        self._changes = changes
+        return changes
+
+    def _schedule_dense_poll(self) -> None:
+        """Schedule the next dense poll."""
+
+        if self._dense_poll_cancel is not None:
+            self._dense_poll_cancel()
+
+        loop = asyncio.get_running_loop()
+
+        def _force_refresh():
+            self._dense_poll_cancel = None
+            loop.create_task(self.async_refresh())
+
+        self._dense_poll_cancel = loop.call_later(DENSE_POLLING_INTERVAL, _force_refresh).cancel
+
+    def _cancel_dense_poll(self) -> None:
+        """Stop dense polling, the command is completed."""
+        self._dense_poll = 0
+        self._command_predicate = None
+        if self._dense_poll_cancel is not None:
+            self._dense_poll_cancel()
+            self._dense_poll_cancel = None
+
+    async def async_command(self, pandora_id: str, command: str, predicate: Callable = None) -> bool:
+        """Send the command to device.
+
+        The response should be like this: {"PANDORA_ID": "sent"}. PANDORA_ID must be the same as in request.
+        If the predicate is given, the command completes when predicate(device) becomes true instead of ucr.
+        """
+
+        if self._dense_poll:
+            raise PandoraApiException("Awaiting previous command")
+
+        self._dense_poll = COMMAND_RESPONSE_TIMEOUT
+        self._command_predicate = (pandora_id, predicate) if predicate is not None else None
+        self._command_response.clear()
+
+        data = {"id": pandora_id, "command": command}
+
+        try:
+            status = (
+                await self._request_safe(
+                    COMMAND_PATH,
+                    method="POST",
+                    data=data,
+                    priority=PRIORITY_COMMAND,
+                    parser=PandoraApiCommandResponseParser,
+                )
+            ).result[pandora_id]
+
+            if status != "sent":
+                raise PandoraApiException(status)
+        except PandoraApiException as ex:
+            self._cancel_dense_poll()
+            _LOGGER.debug("async_command: %s", str(ex))
+            raise PandoraApiException(str(ex)) from None
+
+        _LOGGER.info("Command %s is sent to device %s", command, pandora_id)
+
+        # Start dense polling right away instead of waiting for the next routine update
+        self._schedule_dense_poll()
+
+        try:
+            await asyncio.wait_for(self._command_response.wait(), COMMAND_RESPONSE_TIMEOUT)
+        except asyncio.TimeoutError as ex:
+            self._cancel_dense_poll()
+            _LOGGER.warning("async_command: command timeout")
+            raise PandoraApiException("Command timeout") from None
+
+        self._cancel_dense_poll()
+        _LOGGER.info("Got response for command %s on device %s", command, pandora_id)
+
+        return True
+
+    async def _async_fetch_pages(self, path: str, pandora_id: str, start: int, end: int, parser) -> list:
+        """Fetch all pages of the history within the time range."""
+        records = []
+        while start < end:
+            # Rate limiter makes backfill requests wait for tokens within the deadline
+            url = "{}?id={}&from={}&to={}&limit={}".format(path, pandora_id, start, end, BACKFILL_PAGE_SIZE)
+            page = await self._request_safe(url, priority=PRIORITY_BACKFILL, parser=parser)
+            records.extend(page.records)
+            if len(page.records) < BACKFILL_PAGE_SIZE:
+                break
+            start = page.records[-1]["ts"] + 1
+        return records
+
+    async def async_fetch_history(self, pandora_id: str, start: int, end: int) -> tuple:
+        """Fetch the track and events of the device within the time range.
+
+        Range is split into chunks which are fetched by BACKFILL_CONCURRENCY workers with the lowest priority,
+        so long gaps don't create a task per chunk. Returns lists of points and events sorted by time.
+        """
+        chunks = range(int(start), int(end), BACKFILL_CHUNK)
+        if not chunks:
+            return [], []
+
+        # Track chunks go first, then events ones. Workers share the iterator and store results by index.
+        sources = ((TRACK_PATH, PandoraApiTrackResponseParser), (EVENTS_PATH, PandoraApiEventsResponseParser))
+        jobs = enumerate(product(sources, chunks))
+        results = [None] * (len(sources) * len(chunks))
+
+        async def _worker():
+            for idx, ((path, parser), chunk_start) in jobs:
+                chunk_end = min(chunk_start + BACKFILL_CHUNK, end)
+                results[idx] = await self._async_fetch_pages(path, pandora_id, chunk_start, chunk_end, parser)
+
+        workers = [asyncio.ensure_future(_worker()) for _ in range(min(BACKFILL_CONCURRENCY, len(results)))]
+        try:
+            await asyncio.gather(*workers)
+        except BaseException:
+            # The history is incomplete anyway, don't waste tokens on the rest of chunks
+            for worker in workers:
+                worker.cancel()
+            await asyncio.wait(workers)
+            raise
+        points = [record for result in results[: len(chunks)] for record in result]
+        events = [record for result in results[len(chunks) :] for record in result]
+        _LOGGER.info("Fetched %d points and %d events of PANDORA_ID=%s", len(points), len(events), pandora_id)
+        return points, events
+
+    def start_recording(self, path: str) -> None:
+        """Start recording of the raw traffic to the rotating compressed JSONL file."""
+        self.stop_recording()
+        self._recorder = PandoraTrafficRecorder(path)
+
+    def stop_recording(self) -> None:
+        """Stop recording of the raw traffic."""
+        if self._recorder is not None:
+            self._recorder.close()
+            self._recorder = None
+
+    async def async_replay(self, path: str, speed: float = 1.0) -> int:
+        """Feed the recorded traffic into updates at original (or accelerated) speed.
+
+        Updates are replayed by a separate client with copies of known devices, so polling of this client
+        goes on and the live devices (and the state stored from them) aren't touched. Updates of devices
+        which aren't loaded are skipped. Returns the number of replayed updates.
+        """
+        records = await self._async_add_executor_job(read_records, path)
+        updates = [record for record in records if record["path"].startswith(UPDATE_PATH)]
+        if not updates:
+            return 0
+
+        client = PandoraClient(
+            self._username, self._password, self._polling_interval, session=PandoraReplaySession(records)
+        )
+        # pylint: disable=protected-access
+        client._devices = {
+            pandora_id: PandoraDevice(pandora_id, device.info) for pandora_id, device in self._devices.items()
+        }
+        try:
+            started = monotonic()
+            for record in updates:
+                delay = (record["time"] - updates[0]["time"]) / speed - (monotonic() - started)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                await client.async_refresh()
+        finally:
+            await client.async_close()
+
+        return len(updates)
+
+    async def async_close(self) -> None:
+        """Cancel in-flight requests and scheduled polls. API can't be used after that."""
+        self._closed = True
+        self._cancel_dense_poll()
+        self.stop_recording()
+
+        for task in list(self._inflight):
+            task.cancel()
+        if self._inflight:
+            await asyncio.wait(list(self._inflight))
+
+        if self._owns_session and self._session is not None:
+            await self._session.close()
+
+        _LOGGER.debug("PandoraClient closed")
+
+    async def async_refresh(self) -> None:
+        """Update devices and notify listeners."""
+        await self.async_update()
+        for update_callback in list(self._listeners):
+            update_callback()
+
+    def async_add_listener(self, update_callback: Callable[[], None]) -> Callable[[], None]:
+        """Listen for data updates. Returns the function which removes the listener."""
+        self._listeners.append(update_callback)
+        return lambda: self._listeners.remove(update_callback)
+
+    async def async_run(self) -> None:
+        """Poll the server until the client is closed."""
+        while not self._closed:
+            await self.async_refresh()
+            await asyncio.sleep(self._polling_interval)
+
+
+_MISSING = object()
+
+
+def _number(value):
+    """Numbers are kept as is, numeric strings (like mileage) are converted to float."""
+    if value is None or isinstance(value, (int, float)):
+        return value
+    return float(value)
+
+
+def _balance(value):
+    """{"value": "142.75", "cur": "RUB"} -> 142.75"""
+    if value is None:
+        return None
+    return float(value["value"])
+
+
+class PandoraDeviceState:
+    """Typed state of the device.
+
+    Values are converted once at ingest. Fields which weren't received yet aren't set, so accessing
+    them raises AttributeError. Unknown fields and unused nested blobs (sims, props, tanks) are dropped.
+    """
+
+    CONVERTERS = {
+        "online": _number,
+        "move": _number,
+        "dtime": _number,
+        "dtime_rec": _number,
+        "voltage": _number,
+        "engine_temp": _number,
+        "cabin_temp": _number,
+        "out_temp": _number,
+        "x": _number,
+        "y": _number,
+        "speed": _number,
+        "rot": _number,
+        "engine_rpm": _number,
+        "fuel": _number,
+        "gsm_level": _number,
+        "bit_state_1": _number,
+        "balance": _balance,
+        "balance1": _balance,
+        "active_sim": _number,
+        "mileage": _number,
+        "mileage_CAN": _number,
+        "evaq": _number,
+        "metka": _number,
+        "brelok": _number,
+        "relay": _number,
+        "smeter": _number,
+        "tconsum": _number,
+        "land": _number,
+        "bunker": _number,
+        "ex_status": _number,
+        "engine_remains": _number,
+    }
+
+    __slots__ = tuple(CONVERTERS)
+
+    @classmethod
+    def parse(cls, attributes: dict) -> dict:
+        """Convert and validate raw attributes. Returns only known fields."""
+        result = {}
+        for key, value in attributes.items():
+            converter = cls.CONVERTERS.get(key)
+            if converter is None:
+                continue
+            try:
+                result[key] = converter(value)
+            except (TypeError, ValueError, KeyError):
+                _LOGGER.debug("Invalid value of %s: %s", key, value)
+        return result
+
+    def merge(self, values: dict) -> None:
+        """Apply parsed (possibly partial) update."""
+        for key, value in values.items():
+            setattr(self, key, value)
+
+    def as_dict(self) -> dict:
+        """Fields which were received."""
+        return {key: getattr(self, key) for key in self.__slots__ if hasattr(self, key)}
+
+
+class PandoraDevice:
+    """Pandora device class."""
+
+    def __init__(self, pandora_id: str, info: dict):
+        self._pandora_id = pandora_id
+        self._name = info["name"]
+        self._info = info
+        self._state = PandoraDeviceState()
+        self._online_ts = 0
+        self._track = PandoraTrack()
+        self._totals = PandoraTotals()
+        self._driving = PandoraDrivingDetector()
+        self._history = PandoraHistory()
+        _LOGGER.info("Device %s (PANDORA_ID=%s) created", info["name"], pandora_id)
+
+    @property
+    def name(self) -> str:
+        """Get the name of the device."""
+        return self._name
+
+    @property
+    def info(self) -> dict:
+        """Metadata of the device from the device list."""
+        return self._info
+
+    @property
+    def pandora_id(self) -> str:
+        """Get the PANDORA_ID of the device."""
+        return self._pandora_id
+
+    @property
+    def track(self) -> PandoraTrack:
+        """Compressed track of the device."""
+        return self._track
+
+    @property
+    def totals(self) -> PandoraTotals:
+        """Running totals of engine, idle, autostart and heater time."""
+        return self._totals
+
+    @property
+    def driving(self) -> PandoraDrivingDetector:
+        """Driving behaviour detector."""
+        return self._driving
+
+    @property
+    def history(self) -> PandoraHistory:
+        """Recent history of numeric attributes."""
+        return self._history
+
+    @property
+    def is_online(self) -> bool:
+        """Is device online now?"""
+        return bool(self.online)
+
+    @property
+    def is_moving(self) -> bool:
+        """Is device moving now?"""
+        return bool(getattr(self._state, "move", 0))
+
+    @property
+    def expire_after(self) -> int:
+        """Get expiring timeout."""
+        return int(self._info.get(OPTION_EXPIRE_AFTER, 0))
+
+    @property
+    def timestamp(self) -> int:
+        """Get last online timestamp."""
+        return int(self._online_ts)
+
+    @property
+    def fuel_percentage(self) -> int:
+        """Get fuel in percentage."""
+        return int(self._attribute("fuel"))
+
+    @property
+    def fuel_litres(self) -> int:
+        """Get fuel in liters."""
+        return int(self._info["fuel_tank"]) * self.fuel_percentage / 100
+
+    @property
+    def fuel(self) -> int:
+        """Get fuel in user-defined units."""
+        if self._info.get(OPTION_FUEL_UNITS, FUEL_UNITS[0]) == FUEL_UNITS[0]:
+            return self.fuel_percentage
+
+        return self.fuel_litres
+
+    @property
+    def mileage(self) -> float:
+        """Get mileage from user-defined source with user-defined adjustment."""
+        adjustment = float(self._info.get(OPTION_MILEAGE_ADJUSTMENT, 0))
+
+        if self._info.get(OPTION_MILEAGE_SOURCE, MILEAGE_SOURCES[0]) == MILEAGE_SOURCES[0]:
+            return adjustment + self._attribute("mileage")
+
+        return adjustment + self._attribute("mileage_CAN")
+
+    @property
+    def model(self) -> str:
+        """Get the model of the device."""
+        return self._info["model"]
+
+    @property
+    def firmware(self) -> str:
+        """Get the firmware version of the device."""
+        return self._info["firmware"]
+
+    def update_info(self, info: dict) -> bool:
+        """Update device metadata from the device list. Returns True if visible metadata has changed.
+
+        User-defined options are stored in the same dictionary under their own keys, so they are kept.
+        """
+        changed = any(self._info.get(key) != info.get(key) for key in ("name", "model", "firmware"))
+        self._info.update(info)
+        self._name = info["name"]
+        if changed:
+            _LOGGER.info("Device %s (PANDORA_ID=%s) info updated", self._name, self._pandora_id)
+        return changed
+
+    def has_feature(self, feature: str) -> bool:
+        """Check the feature in the features block of the device list.
+
+        Devices without the block are considered to support everything.
+        """
+        features = self._info.get("features")
+        return features is None or bool(features.get(feature))
+
+    def permission(self, name: str) -> int:
+        """Get the level of the permission from the device list (0 - no access)."""
+        permissions = self._info.get("permissions")
+        if permissions is None:
+            return 3
+        return int(permissions.get(name) or 0)
+
+    def user_defined_units(self, item):
+        """Get units of attribute."""
+        return self._info.get(item + "_units")
+
+    def user_defined_filter(self, item) -> tuple:
+        """Get deadband and hysteresis of attribute. None if not overridden."""
+        return self._info.get(item + "_deadband"), self._info.get(item + "_hysteresis")
+
+    def _attribute(self, item):
+        """Get backend attribute. Raises KeyError if it wasn't received yet."""
+        try:
+            return getattr(self._state, item)
+        except AttributeError:
+            raise KeyError(item) from None
+
+    def __getattr__(self, item):
+        """Generic get function for all backend attributes."""
+        return self._attribute(item)
+
+    def get(self, item, default=None):
+        """Get backend attribute without raising if it wasn't received yet."""
+        return getattr(self._state, item, default)
+
+    def as_dict(self) -> dict:
+        """All received attributes."""
+        return self._state.as_dict()
+
+    async def config_options(self, options: dict) -> None:
+        """Save options from config_entry."""
+        self._info.update(options)
+
+    async def update(self, attributes: dict, online_ts: int) -> dict:
+        """Read new status data from the server.
+
+        Attributes must be already parsed by PandoraDeviceState.parse(). Returns changed attributes.
+        """
+
+        changes = {key: value for key, value in attributes.items() if getattr(self._state, key, _MISSING) != value}
+
+        # Merge will be more suitable here. If we get empty or partial update
+        # the state will still contain previous data.
+        self._state.merge(attributes)
+        self._online_ts = online_ts
+
+        flags = self.get("bit_state_1")
+        if flags is not None:
+            self._totals.update(self.get("dtime") or online_ts, flags, self.get("speed", 0))
+
+        if "speed" in attributes or "rot" in attributes:
+            self._driving.update(self.get("dtime") or online_ts, self.get("speed", 0), self.get("rot", 0))
+
+        self._history.update(self.get("dtime") or online_ts, attributes)
+        _LOGGER.info("Device %s (PANDORA_ID=%s) updated", self._name, self._pandora_id)
+        return changes
+
+
+class PandoraApiLoginResponseParser:
+    """
+    {
+        "message":"",
+        "status":"success",
+        "user_id":567890,
+        "lang":"ru",
+        "session_id":"943a85be7c446e87b55ffbece22ee134"
+    }
+    """
+
+    def __init__(self, response):
+        self.session_id = response["session_id"]
+
+
+class PandoraApiDevicesResponseParser:
+    """
+    [
+    {
+        "id":1234,
+        "type":"alarm",
+        "car_type":0,
+        "name":"Honda Pilot",
+        "photo":"wZa0x4FDoLThP6w+8Jmvsw==",
+        "color":"rgb(255,255,255)",
+        "auto_marka":"",
+        "auto_model":"",
+        "tanks":[],
+        "features":{
+            "auto_check":1,
+            "value_100":1,
+            "events":1,
+            "tracking":1,
+            "connection":1,
+            "sensors":1,
+            "autostart":1,
+            "heater":1,
+            "schedule":1,
+            "notification":1,
+            "beep":1,
+            "light":1,
+            "channel":1,
+            "trunk":1,
+            "active_security":1,
+            "keep_alive":1,
+            "custom_phones":1
+        },
+        "fuel_tank":50,
+        "permissions":{
+            "control":3,
+            "settings":3,
+            "settings_save":3,
+            "events":3,
+            "tracks":3,
+            "status":3,
+            "oauth":3,
+            "rules":3,
+            "tanks":3,
+            "tanks_save":3,
+            "detach":3
+        },
+        "is_shared":false,
+        "phone":"+71234567890",
+        "phone1":"",
+        "active_sim":0,
+        "model":"DXL-5570",
+        "voice_version":"1.23F361",
+        "firmware":"2.33",
+        "start_ownership":1493996199,
+        "owner_id":-1
+    }
+    ]
+    """
+
+    def __init__(self, response):
+        self.devices = {}
+
+        for enity in response:
+            self.devices[str(enity["id"])] = enity
+
+
+class PandoraApiUpdateResponseParser:
+    """
+    {
+        "ts":1599698262, <--- Current timestamp
+        "lenta": [{  <--- The list of events
+            "type": 0,
+            "time": 1600553265,
+            "obj": {
+                "dev_id": 1234,
+                "id": 862125457,
+                "x": 54.924888,
+                "y": 82.981296,
+                "speed": 0,
+                "dtime": 1600553265,
+                "dtime_rec": 1600528068,
+                "bit_state_1": 230273,
+                "engine_rpm": 0,
+                "engine_temp": 18,
+                "cabin_temp": 14,
+                "out_temp": 13,
+                "fuel": 43,
+                "voltage": 12.3,
+                "gsm_level": 2,
+                "eventid1": 14,
+                "eventid2": 3,
+                "weather": 0,
+                "body": null
+            }
+        }],
+        "time":{
+            "1234":{
+                "online":1599696535,
+                "onlined":1599721730,
+                "command":1599695573,
+                "setting":1598267291
+            }
+        },
+        "stats":{
+            "1234":{
+                "online":0,
+                "move":0,
+                "dtime":1599721704,
+                "dtime_rec":1599696508,  <--- timestamp of the data in stats section
+                "voltage":13.5,
+                "engine_temp":43,
+                "x":55.080632,
+                "y":82.929008,
+                "bit_state_1":230284,
+                "out_temp":17,
+                "balance":{
+                    "value":"142.75",
+                    "cur":"RUB"
+                },
+                "balance1":{
+                    "value":"0.00",
+                    "cur":"RUB"
+                },
+                "sims":[
+                    {
+                    "phoneNumber":"+79851017237",
+                    "isActive":true,
+                    "balance":{
+                        "value":"142.75",
+                        "cur":"RUB"
+                    }
+                    }
+                ],
+                "active_sim":0,
+                "speed":57.412,
+                "tanks":[],
+                "engine_rpm":112,
+                "rot":63,
+                "fuel":57,
+                "cabin_temp":24,
+                "evaq":0,
+                "gsm_level":3,
+                "props":[],
+                "mileage":"28381.474447810226",
+                "mileage_CAN":0,
+                "metka":0,
+                "brelok":0,
+                "relay":0,
+                "smeter":0,
+                "tconsum":0,
+                "land":0,
+                "bunker":0,
+                "ex_status":0,
+                "engine_remains":0
+            }
+        },
+        "ucr":{  <--- what does it mean? User command response?
+            "1234":3
+        }
+    }
+
+    device-control.js:unpackStatusFlags
+        r.b_locked = bb.shiftRight(0).and(1).toJSNumber(); // под охраной;
+        r.b_alarm = bb.shiftRight(1).and(1).toJSNumber(); // тревога;
+        r.b_engine = bb.shiftRight(2).and(1).toJSNumber(); // двигатель заведен;
+        r.b_ignition = bb.shiftRight(3).and(1).toJSNumber(); // зажигание включено;
+        r.b_autostart_init = bb.shiftRight(4).and(1).toJSNumber(); // процедура АЗ активна;
+        r.b_hf_lock = bb.shiftRight(5).and(1).toJSNumber(); // HandsFree постановка под охрану при удалении от авто
+        r.b_hf_unlock = bb.shiftRight(6).and(1).toJSNumber(); // HandsFree снятие с охраны при приближении к авто
+        r.b_gsm = bb.shiftRight(7).and(1).toJSNumber(); // Gsm-модем включен
+
+        r.b_gps = bb.shiftRight(8).and(1).toJSNumber(); // Gps-приемник включен
+        r.b_tracking = bb.shiftRight(9).and(1).toJSNumber(); // трекинг включен
+        r.b_immo = bb.shiftRight(10).and(1).toJSNumber(); // Двигатель заблокирован
+        r.b_ext_sensor_alert_zone = bb.shiftRight(11).and(1).toJSNumber(); // Отключен контроль доп. датчика, предупредительная зона
+        r.b_ext_sensor_main_zone = bb.shiftRight(12).and(1).toJSNumber(); // Отключен контроль доп. датчика, основная зона
+        r.b_sensor_alert_zone = bb.shiftRight(13).and(1).toJSNumber(); // Отключен контроль датчика удара, предупредительная зона
+        r.b_sensor_main_zone = bb.shiftRight(14).and(1).toJSNumber(); // Отключен контроль датчика удара, основная зона
+        r.b_autostart = bb.shiftRight(15).and(1).toJSNumber(); // Запрограммирован АЗ двигателя
+
+        r.b_sms = bb.shiftRight(16).and(1).toJSNumber(); // Разрешена отправка СМС – сообщений
+        r.b_call = bb.shiftRight(17).and(1).toJSNumber(); // Разрешены голосовые вызовы
+        r.b_light = bb.shiftRight(18).and(1).toJSNumber(); // Включены габаритные огни (фары, свет.)
+        r.b_sound1 = bb.shiftRight(19).and(1).toJSNumber(); // Выкл. Предупредительные сигналы сирены
+        r.b_sound2 = bb.shiftRight(20).and(1).toJSNumber(); // Выкл. Все звуковые сигналы сирены
+        r.b_door_front_left = bb.shiftRight(21).and(1).toJSNumber();
+        r.b_door_front_right = bb.shiftRight(22).and(1).toJSNumber();
+        r.b_door_back_left = bb.shiftRight(23).and(1).toJSNumber();
+
+        r.b_door_back_right = bb.shiftRight(24).and(1).toJSNumber();
+        r.b_trunk = bb.shiftRight(25).and(1).toJSNumber(); // багажник
+        r.b_hood = bb.shiftRight(26).and(1).toJSNumber(); // капот
+        r.b_handbrake = bb.shiftRight(27).and(1).toJSNumber(); // ручной тормоз
+        r.b_brakes = bb.shiftRight(28).and(1).toJSNumber(); // тормоз
+        r.b_temp = bb.shiftRight(29).and(1).toJSNumber(); // предпусковой подогреватель
+        r.b_active_secure = bb.shiftRight(30).and(1).toJSNumber(); // активная охрана
+        r.b_heat = bb.shiftRight(31).and(1).toJSNumber(); // Запрограммирован пред. подогреватель
+
+        r.b_evaq = bb.shiftRight(33).and(1).toJSNumber(); // режим эвакуации включен
+        r.b_to = bb.shiftRight(34).and(1).toJSNumber(); // режим ТО включен
+        r.b_stay_home = bb.shiftRight(35).and(1).toJSNumber(); // stay home
+        r.b_zapret_oprosa_metok = bb.shiftRight(60).and(1).toJSNumber(); // запрет опроса меток
+        r.b_zapret_snyatia_s_ohrani_bez_metki = bb.shiftRight(61).and(1).toJSNumber(); // запрет снятия с охраны при отсутствии метки в зоне
+    """
+
+    def __init__(self, response, skip=frozenset()):
+        self.stats = {
+            sys.intern(str(pandora_id)): PandoraDeviceState.parse(attrs)
+            for pandora_id, attrs in (response.get("stats") or {}).items()
+            if str(pandora_id) not in skip
+        }
+        self.time = response.get("time")
+        self.ucr = response.get("ucr")
+        self.timestamp = response.get("ts")
+
+
+class PandoraApiCommandResponseParser:
+    """
+    {
+        "action_result": {
+            "1234": "sent"
+        }
+    }
+    """
+
+    def __init__(self, response):
+        self.result = response["action_result"]
+
+
+class PandoraApiTrackResponseParser:
+    """
+    {
+        "points":[
+            {"ts":1599696508, "x":55.755826, "y":37.6173, "speed":42.5, "rot":90},
+            ...
+        ]
+    }
+    """
+
+    def __init__(self, response):
+        self.records = sorted(
+            (
+                {
+                    "ts": int(point["ts"]),
+                    "x": float(point["x"]),
+                    "y": float(point["y"]),
+                    "speed": float(point.get("speed") or 0),
+                    "rot": float(point.get("rot") or 0),
+                }
+                for point in response.get("points") or []
+            ),
+            key=lambda point: point["ts"],
+        )
+
+
+class PandoraApiEventsResponseParser:
+    """
+    {
+        "lenta":[
+            {"obj":{"dtime":1599696508, "eventid1":1, "eventid2":2, "title":"Guard on"}},
+            ...
+        ]
+    }
+    """
+
+    def __init__(self, response):
+        self.records = sorted(
+            (
+                {
+                    "ts": int(item["obj"]["dtime"]),
+                    "event": item["obj"].get("eventid1"),
+                    "subevent": item["obj"].get("eventid2"),
+                    "title": item["obj"].get("title"),
+                }
+                for item in response.get("lenta") or []
+                if "obj" in item
+            ),
+            key=lambda event: event["ts"],
+        )
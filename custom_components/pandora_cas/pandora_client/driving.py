@@ -0,0 +1,146 @@
+"""Streaming detector of driving behaviour.
+
+Every update costs O(1): only the last WINDOW_SIZE samples are kept. Detected events are queued
+until the consumer pops them.
+"""
+from collections import deque
+
+WINDOW_SIZE = 8
+
+OVERSPEED_LIMIT = 110  # km/h
+OVERSPEED_HYSTERESIS = 5  # km/h, episode ends below the limit minus hysteresis
+HARSH_ACCELERATION = 3.0  # m/s2
+HARSH_BRAKING = 3.5  # m/s2
+MAX_SAMPLE_INTERVAL = 10  # s, acceleration over longer intervals isn't reliable
+HARSH_DEBOUNCE = 5  # s, continuous acceleration or braking is one event
+SHARP_TURN = 60  # deg of heading change
+SHARP_TURN_TIME = 5  # s
+SHARP_TURN_MIN_SPEED = 20  # km/h
+TRIP_END_TIMEOUT = 300  # s without movement
+MAX_EVENTS = 100  # events which weren't popped are dropped
+
+TRIP_COUNTERS = ("overspeed", "harsh_acceleration", "harsh_braking", "sharp_turn")
+
+
+def _heading_delta(heading1: float, heading2: float) -> float:
+    """Absolute difference of headings in degrees (0-180)."""
+    delta = abs(heading1 - heading2) % 360
+    return 360 - delta if delta > 180 else delta
+
+
+class PandoraDrivingDetector:
+    """Overspeed episodes, harsh acceleration and braking, sharp turns and per-trip counters."""
+
+    def __init__(self) -> None:
+        """Constructor"""
+        self._window = deque(maxlen=WINDOW_SIZE)  # (ts, speed, heading)
+        self._events = deque(maxlen=MAX_EVENTS)
+        self._overspeed_start = None
+        self._overspeed_max = 0
+        self._last_turn_ts = 0
+        self._last_harsh_ts = 0
+        self._trip_start = None
+        self._last_moving_ts = 0
+        self.trip = dict.fromkeys(TRIP_COUNTERS, 0)
+        self.trip_max_speed = 0
+
+    def pop_events(self) -> list:
+        """Take detected events: [(type, data)]."""
+        events = list(self._events)
+        self._events.clear()
+        return events
+
+    def _emit(self, event_type: str, **data) -> None:
+        data["trip"] = dict(self.trip)
+        self._events.append((event_type, data))
+
+    def check_timeout(self, now: float) -> None:
+        """End the trip if the car hasn't moved for TRIP_END_TIMEOUT.
+
+        Parked cars usually stop reporting, so it's called on every update tick too, not only on samples.
+        """
+        if self._trip_start is not None and now - self._last_moving_ts >= TRIP_END_TIMEOUT:
+            if self._overspeed_start is not None:
+                self._emit(
+                    "overspeed_end",
+                    duration=self._last_moving_ts - self._overspeed_start,
+                    max_speed=self._overspeed_max,
+                )
+                self._overspeed_start = None
+            self._emit(
+                "trip_end", duration=self._last_moving_ts - self._trip_start, max_speed=self.trip_max_speed
+            )
+            self._trip_start = None
+
+    def update(self, ts: int, speed: float, heading: float) -> None:
+        """Process the sample."""
+        if self._window and ts <= self._window[-1][0]:
+            return
+        speed = speed or 0
+        heading = heading or 0
+
+        self.check_timeout(ts)
+        self._update_trip(ts, speed)
+        if self._trip_start is not None:
+            self._detect_overspeed(ts, speed)
+            self._detect_acceleration(ts, speed)
+            self._detect_turn(ts, speed, heading)
+
+        self._window.append((ts, speed, heading))
+
+    def _update_trip(self, ts: int, speed: float) -> None:
+        if speed > 0:
+            self._last_moving_ts = ts
+            if self._trip_start is None:
+                self._trip_start = ts
+                self.trip = dict.fromkeys(TRIP_COUNTERS, 0)
+                self.trip_max_speed = 0
+                self._emit("trip_start")
+            self.trip_max_speed = max(self.trip_max_speed, speed)
+
+    def _detect_overspeed(self, ts: int, speed: float) -> None:
+        if self._overspeed_start is None:
+            if speed > OVERSPEED_LIMIT:
+                self._overspeed_start = ts
+                self._overspeed_max = speed
+                self.trip["overspeed"] += 1
+                self._emit("overspeed_start", speed=speed, limit=OVERSPEED_LIMIT)
+        elif speed < OVERSPEED_LIMIT - OVERSPEED_HYSTERESIS:
+            self._emit("overspeed_end", duration=ts - self._overspeed_start, max_speed=self._overspeed_max)
+            self._overspeed_start = None
+        else:
+            self._overspeed_max = max(self._overspeed_max, speed)
+
+    def _detect_acceleration(self, ts: int, speed: float) -> None:
+        if not self._window:
+            return
+        prev_ts, prev_speed, _ = self._window[-1]
+        interval = ts - prev_ts
+        if interval > MAX_SAMPLE_INTERVAL or ts - self._last_harsh_ts < HARSH_DEBOUNCE:
+            return
+
+        acceleration = (speed - prev_speed) / 3.6 / interval
+        if acceleration >= HARSH_ACCELERATION:
+            self._last_harsh_ts = ts
+            self.trip["harsh_acceleration"] += 1
+            self._emit("harsh_acceleration", acceleration=round(acceleration, 2), speed=speed)
+        elif acceleration <= -HARSH_BRAKING:
+            self._last_harsh_ts = ts
+            self.trip["harsh_braking"] += 1
+            self._emit("harsh_braking", acceleration=round(acceleration, 2), speed=speed)
+
+    def _detect_turn(self, ts: int, speed: float, heading: float) -> None:
+        if speed < SHARP_TURN_MIN_SPEED or ts - self._last_turn_ts < SHARP_TURN_TIME:
+            return
+        # Window is fixed-size, so it's still O(1)
+        for prev_ts, prev_speed, prev_heading in reversed(self._window):
+            if ts - prev_ts > SHARP_TURN_TIME:
+                break
+            if prev_speed < SHARP_TURN_MIN_SPEED:
+                continue
+            delta = _heading_delta(heading, prev_heading)
+            if delta >= SHARP_TURN:
+                self._last_turn_ts = ts
+                self.trip["sharp_turn"] += 1
+                self._emit("sharp_turn", heading_change=round(delta), speed=speed)
+                return
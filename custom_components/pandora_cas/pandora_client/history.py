@@ -0,0 +1,129 @@
+"""Recent history of numeric attributes in fixed-size ring buffers.
+
+Not more than one sample per HISTORY_RESOLUTION is kept, so buffers cover the same time span
+regardless of the polling interval. Reads are memory lookups, the recorder database isn't touched.
+"""
+from array import array
+from itertools import accumulate
+
+HISTORY_ATTRIBUTES = ("voltage", "fuel", "engine_temp", "cabin_temp", "out_temp", "speed", "engine_rpm", "gsm_level")
+HISTORY_RESOLUTION = 60  # s
+HISTORY_SIZE = 1440  # samples, 24 hours
+# Float32 values are rounded on output to hide representation noise (12.6 -> 12.600000381)
+HISTORY_PRECISION = 2
+
+
+class PandoraRingBuffer:
+    """Samples in preallocated time and value arrays. The oldest sample is overwritten when full."""
+
+    __slots__ = ("_times", "_values", "_head", "_count")
+
+    def __init__(self, size: int = HISTORY_SIZE):
+        self._times = array("q", bytes(8 * size))
+        self._values = array("f", bytes(4 * size))
+        self._head = 0  # index of the next write
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def clear(self) -> None:
+        """Drop all samples."""
+        self._head = self._count = 0
+
+    def append(self, ts: int, value: float, resolution: int = HISTORY_RESOLUTION) -> None:
+        """Add the sample. Samples within the resolution from the last one replace its value."""
+        if self._count:
+            last_ts = self._times[self._head - 1]
+            if ts < last_ts:
+                return
+            if ts - last_ts < resolution:
+                self._values[self._head - 1] = value
+                return
+
+        self._times[self._head] = int(ts)
+        self._values[self._head] = value
+        self._head = (self._head + 1) % len(self._times)
+        self._count = min(self._count + 1, len(self._times))
+
+    def samples(self):
+        """Generate (time, value) starting from the oldest sample."""
+        size = len(self._times)
+        first = (self._head - self._count) % size
+        for offset in range(self._count):
+            idx = (first + offset) % size
+            yield self._times[idx], self._values[idx]
+
+    def downsample(self, start: int, end: int, points: int) -> list:
+        """Mean values of equal buckets between start and end.
+
+        Devices report only changes, so empty buckets carry the previous value. None before the first sample.
+        """
+        step = (end - start) / points
+        sums = [0.0] * points
+        counts = [0] * points
+        previous = None
+        for ts, value in self.samples():
+            if ts < start:
+                previous = value
+                continue
+            if ts >= end:
+                break
+            bucket = int((ts - start) / step)
+            sums[bucket] += value
+            counts[bucket] += 1
+
+        result = []
+        for total, count in zip(sums, counts):
+            if count:
+                previous = total / count
+            result.append(None if previous is None else round(previous, HISTORY_PRECISION))
+        return result
+
+
+class PandoraHistory:
+    """Ring buffers of the device attributes."""
+
+    def __init__(self, attributes: tuple = HISTORY_ATTRIBUTES, size: int = HISTORY_SIZE):
+        self._buffers = {name: PandoraRingBuffer(size) for name in attributes}
+
+    def __getitem__(self, name: str) -> PandoraRingBuffer:
+        return self._buffers[name]
+
+    def update(self, ts: int, attributes: dict) -> None:
+        """Add received values of tracked attributes."""
+        for name, buffer in self._buffers.items():
+            value = attributes.get(name)
+            if value is not None:
+                buffer.append(ts, value)
+
+    def downsample(self, names: list, start: int, end: int, points: int) -> dict:
+        """Downsampled series of attributes: {name: [value]}."""
+        return {name: self._buffers[name].downsample(start, end, points) for name in names if name in self._buffers}
+
+    def as_dict(self) -> dict:
+        """Compact representation to be stored. Times are delta-encoded."""
+        result = {}
+        for name, buffer in self._buffers.items():
+            times, values = zip(*buffer.samples()) if len(buffer) else ((), ())
+            result[name] = {
+                "time": [ts - previous for ts, previous in zip(times, (0,) + times)],
+                "value": [round(value, HISTORY_PRECISION) for value in values],
+            }
+        return result
+
+    def restore(self, data: dict) -> None:
+        """Prepend stored samples to the ones received since start."""
+        for name, stored in data.items():
+            buffer = self._buffers.get(name)
+            if buffer is None:
+                continue
+
+            received = list(buffer.samples())
+            first_received = received[0][0] if received else None
+            buffer.clear()
+            for ts, value in zip(accumulate(stored["time"]), stored["value"]):
+                if first_received is None or ts < first_received:
+                    buffer.append(ts, value)
+            for ts, value in received:
+                buffer.append(ts, value)
@@ -0,0 +1,146 @@
+"""Prometheus metrics of the API client and its devices.
+
+Text is rendered in the exposition format 0.0.4.
+"""
+from bisect import bisect_left
+
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 15)
+
+# Metric name -> (raw device attribute, help)
+DEVICE_GAUGES = {
+    "voltage_volts": ("voltage", "Battery voltage"),
+    "fuel_percent": ("fuel", "Fuel level"),
+    "engine_temperature_celsius": ("engine_temp", "Engine temperature"),
+    "cabin_temperature_celsius": ("cabin_temp", "Cabin temperature"),
+    "ambient_temperature_celsius": ("out_temp", "Ambient temperature"),
+    "speed_kmh": ("speed", "Speed"),
+    "engine_rpm": ("engine_rpm", "Engine RPM"),
+    "gsm_level": ("gsm_level", "GSM level"),
+    "mileage_km": ("mileage", "Mileage"),
+    "balance": ("balance", "SIM balance"),
+    "online": ("online", "Device is online"),
+    "moving": ("move", "Device is moving"),
+}
+
+FLAG_BITS = 32
+
+
+class PandoraClientMetrics:
+    """Counters of requests to the server."""
+
+    def __init__(self) -> None:
+        """Constructor"""
+        self.latency = {}  # endpoint -> counts per bucket (the last one is +Inf)
+        self.latency_sum = {}
+        self.failures = {}
+        self.relogins = 0
+
+    def observe(self, endpoint: str, seconds: float) -> None:
+        """Account the duration of the successful request."""
+        counts = self.latency.get(endpoint)
+        if counts is None:
+            counts = self.latency[endpoint] = [0] * (len(LATENCY_BUCKETS) + 1)
+            self.latency_sum[endpoint] = 0.0
+        counts[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.latency_sum[endpoint] += seconds
+
+    def failure(self, endpoint: str) -> None:
+        """Account the failed request."""
+        self.failures[endpoint] = self.failures.get(endpoint, 0) + 1
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels) -> str:
+    return "{" + ",".join('{}="{}"'.format(key, _escape(value)) for key, value in labels.items()) + "}"
+
+
+def _header(lines: list, name: str, kind: str, text: str) -> None:
+    lines.append("# HELP {} {}".format(name, text))
+    lines.append("# TYPE {} {}".format(name, kind))
+
+
+def render_metrics(client) -> bytes:
+    """Render metrics of the client and all its devices."""
+    lines = []
+    devices = list(client.devices.values())
+    labels = {device.pandora_id: _labels(pandora_id=device.pandora_id, name=device.name) for device in devices}
+
+    for name, (attr, text) in DEVICE_GAUGES.items():
+        metric = "pandora_device_" + name
+        _header(lines, metric, "gauge", text)
+        for device in devices:
+            value = device.get(attr)
+            if value is not None:
+                lines.append("{}{} {}".format(metric, labels[device.pandora_id], float(value)))
+
+    _header(lines, "pandora_device_online_age_seconds", "gauge", "Time since the device was online")
+    for device in devices:
+        if device.timestamp:
+            age = max(0, client.timestamp - device.timestamp)
+            lines.append("pandora_device_online_age_seconds{} {}".format(labels[device.pandora_id], age))
+
+    _header(lines, "pandora_device_flag", "gauge", "Bits of the device state (bit_state_1)")
+    for device in devices:
+        flags = device.get("bit_state_1")
+        if flags is None:
+            continue
+        flags = int(flags)
+        for bit in range(FLAG_BITS):
+            lines.append(
+                "pandora_device_flag{} {}".format(
+                    _labels(pandora_id=device.pandora_id, name=device.name, bit=bit), (flags >> bit) & 1
+                )
+            )
+
+    metrics = client.metrics
+    _header(lines, "pandora_api_request_duration_seconds", "histogram", "Duration of successful requests")
+    for endpoint, counts in metrics.latency.items():
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS + ("+Inf",), counts):
+            cumulative += count
+            lines.append(
+                "pandora_api_request_duration_seconds_bucket{} {}".format(
+                    _labels(endpoint=endpoint, le=bound), cumulative
+                )
+            )
+        lines.append(
+            "pandora_api_request_duration_seconds_sum{} {}".format(
+                _labels(endpoint=endpoint), metrics.latency_sum[endpoint]
+            )
+        )
+        lines.append("pandora_api_request_duration_seconds_count{} {}".format(_labels(endpoint=endpoint), cumulative))
+
+    _header(lines, "pandora_api_request_failures_total", "counter", "Failed requests")
+    for endpoint, count in metrics.failures.items():
+        lines.append("pandora_api_request_failures_total{} {}".format(_labels(endpoint=endpoint), count))
+
+    _header(lines, "pandora_api_request_timeouts_total", "counter", "Requests which didn't fit into the deadline")
+    for endpoint, count in client.timeouts.items():
+        lines.append("pandora_api_request_timeouts_total{} {}".format(_labels(endpoint=endpoint), count))
+
+    _header(lines, "pandora_api_relogins_total", "counter", "Relogins after session expiration")
+    lines.append("pandora_api_relogins_total {}".format(metrics.relogins))
+
+    _header(lines, "pandora_api_rate_limited_total", "counter", "Requests dropped by the rate limiter")
+    lines.append("pandora_api_rate_limited_total {}".format(client.rate_limiter.dropped))
+
+    _header(lines, "pandora_api_circuit_open", "gauge", "Server is considered down")
+    lines.append("pandora_api_circuit_open {}".format(int(client.is_stale)))
+
+    _header(lines, "pandora_api_host_rtt_seconds", "gauge", "Smoothed response time of the host")
+    selector = client.host_selector
+    for host in selector.hosts:
+        lines.append("pandora_api_host_rtt_seconds{} {}".format(_labels(host=host), selector.rtt[host]))
+
+    _header(lines, "pandora_api_host_error_rate", "gauge", "Smoothed error rate of the host")
+    for host in selector.hosts:
+        lines.append("pandora_api_host_error_rate{} {}".format(_labels(host=host), selector.error_rate[host]))
+
+    _header(lines, "pandora_api_last_update_timestamp_seconds", "gauge", "Server timestamp of the last update")
+    lines.append("pandora_api_last_update_timestamp_seconds {}".format(client.timestamp))
+
+    lines.append("")
+    return "\n".join(lines).encode()
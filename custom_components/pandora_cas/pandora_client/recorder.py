@@ -0,0 +1,156 @@
+"""Recording of the raw traffic and its offline replay.
+
+Request/response pairs are written as JSON lines to the rotating gzip file by a background
+thread, so recording costs nothing on the event loop. Credentials, session ids and phone
+numbers are redacted. Recorded files can be replayed through PandoraReplaySession.
+"""
+from collections import defaultdict, deque
+import gzip
+import json
+import logging
+import os
+import queue
+import threading
+from urllib.parse import urlsplit
+
+import aiohttp
+
+_LOGGER = logging.getLogger(__name__)
+
+RECORD_MAX_BYTES = 10 * 1024 * 1024  # uncompressed
+RECORD_BACKUP_COUNT = 5
+
+REDACTED_KEYS = {"login", "password", "session_id", "sid", "phone", "phone1", "phoneNumber"}
+REDACTED = "**REDACTED**"
+
+
+def _redact(value):
+    """Replace sensitive values in nested dicts and lists."""
+    if isinstance(value, dict):
+        return {key: REDACTED if key in REDACTED_KEYS else _redact(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_redact(item) for item in value]
+    return value
+
+
+class PandoraTrafficRecorder:
+    """Rotating compressed JSONL writer."""
+
+    def __init__(self, path: str, max_bytes: int = RECORD_MAX_BYTES, backup_count: int = RECORD_BACKUP_COUNT):
+        self._path = path
+        self._max_bytes = max_bytes
+        self._backup_count = backup_count
+        self._queue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name="pandora_cas_recorder", daemon=True)
+        self._thread.start()
+        _LOGGER.info("Traffic recording to %s started", path)
+
+    @property
+    def path(self) -> str:
+        """Path of the current file."""
+        return self._path
+
+    def record(self, entry: dict) -> None:
+        """Queue the entry. Body is kept as raw bytes until it's written."""
+        self._queue.put(entry)
+
+    def close(self) -> None:
+        """Write queued entries and stop the writer."""
+        self._queue.put(None)
+
+    def _rotate(self) -> None:
+        for index in range(self._backup_count - 1, 0, -1):
+            source = "{}.{}".format(self._path, index)
+            if os.path.exists(source):
+                os.replace(source, "{}.{}".format(self._path, index + 1))
+        os.replace(self._path, self._path + ".1")
+
+    def _run(self) -> None:
+        file = gzip.open(self._path, "at", encoding="utf-8")
+        written = 0
+        try:
+            while True:
+                entry = self._queue.get()
+                if entry is None:
+                    break
+
+                body = entry.get("body")
+                if isinstance(body, bytes):
+                    try:
+                        entry["body"] = _redact(json.loads(body))
+                    except ValueError:
+                        entry["body"] = body.decode(errors="replace")
+                entry["data"] = _redact(entry.get("data"))
+
+                line = json.dumps(entry, ensure_ascii=False) + "\n"
+                file.write(line)
+                written += len(line)
+
+                if written >= self._max_bytes:
+                    file.close()
+                    self._rotate()
+                    file = gzip.open(self._path, "at", encoding="utf-8")
+                    written = 0
+        except OSError as ex:
+            _LOGGER.error("Traffic recording failed: %s", str(ex))
+        finally:
+            file.close()
+            _LOGGER.info("Traffic recording to %s stopped", self._path)
+
+
+def read_records(path: str) -> list:
+    """Read all records of the file and its rotated backups, oldest first. Blocking."""
+    files = []
+    index = 1
+    while os.path.exists("{}.{}".format(path, index)):
+        files.insert(0, "{}.{}".format(path, index))
+        index += 1
+    if os.path.exists(path):
+        files.append(path)
+
+    records = []
+    for name in files:
+        with gzip.open(name, "rt", encoding="utf-8") as file:
+            records.extend(json.loads(line) for line in file if line.strip())
+    return records
+
+
+class _ReplayResponse:
+    """Minimal aiohttp response replacement."""
+
+    def __init__(self, status: int, body: bytes):
+        self.status = status
+        self._body = body
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *_):
+        return False
+
+    async def read(self) -> bytes:
+        """Recorded body."""
+        return self._body
+
+
+class PandoraReplaySession:
+    """aiohttp-like session which answers with recorded responses.
+
+    Every endpoint gets its recorded responses in the original order.
+    """
+
+    def __init__(self, records: list):
+        self._responses = defaultdict(deque)
+        for record in records:
+            body = record.get("body")
+            if not isinstance(body, str):
+                body = json.dumps(body)
+            self._responses[urlsplit(record["path"]).path].append((record.get("status", 200), body.encode()))
+
+    # pylint: disable=unused-argument
+    def request(self, method, url, **kwargs):
+        """Return the next recorded response of the endpoint."""
+        responses = self._responses.get(urlsplit(url).path)
+        if not responses:
+            raise aiohttp.ClientConnectionError("Replay is over")
+        return _ReplayResponse(*responses.popleft())
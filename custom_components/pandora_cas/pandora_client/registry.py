@@ -0,0 +1,82 @@
+"""Registry of devices shared between accounts.
+
+The device with is_shared flag is visible to several accounts. The registry keeps one PandoraDevice
+object per PANDORA_ID for all of them. Only the owning account applies updates of the device, the
+other accounts skip it (and don't poll at all if they have nothing else). Commands go through the
+account with the strongest permissions.
+"""
+import logging
+
+from .api import PandoraClient
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def _strength(device) -> tuple:
+    """Control permission first, then the sum of all permissions."""
+    permissions = device.info.get("permissions") or {}
+    return device.permission("control"), sum(int(level or 0) for level in permissions.values())
+
+
+class PandoraDeviceRegistry:
+    """Devices of several accounts keyed by PANDORA_ID."""
+
+    def __init__(self) -> None:
+        """Constructor"""
+        self._devices = {}
+        # PANDORA_ID -> {client: strength}, the first client is the owner
+        self._clients = {}
+
+    @property
+    def devices(self) -> dict:
+        """All physical devices."""
+        return self._devices
+
+    def attach(self, client: PandoraClient) -> None:
+        """Register devices of the client. It must be called after the client has loaded devices."""
+        for pandora_id, device in list(client.devices.items()):
+            clients = self._clients.setdefault(pandora_id, {})
+            clients[client] = _strength(device)
+
+            shared = self._devices.get(pandora_id)
+            if shared is None:
+                self._devices[pandora_id] = device
+                client.skip_device(pandora_id, False)
+                continue
+
+            client.devices[pandora_id] = shared
+            client.skip_device(pandora_id, True)
+            _LOGGER.info(
+                "Device %s (PANDORA_ID=%s) is shared, it's polled by %s",
+                device.name,
+                pandora_id,
+                self.owner(pandora_id).username,
+            )
+
+    def detach(self, client: PandoraClient) -> None:
+        """Forget the client and pass its devices to the next owners."""
+        for pandora_id, clients in list(self._clients.items()):
+            if clients.pop(client, None) is None:
+                continue
+            if not clients:
+                del self._clients[pandora_id]
+                del self._devices[pandora_id]
+                continue
+            self.owner(pandora_id).skip_device(pandora_id, False)
+
+    def owner(self, pandora_id: str) -> PandoraClient:
+        """Client which polls the device."""
+        return next(iter(self._clients[pandora_id]))
+
+    def clients(self, pandora_id: str) -> list:
+        """All clients which see the device."""
+        return list(self._clients.get(pandora_id, ()))
+
+    def command_client(self, pandora_id: str) -> PandoraClient:
+        """Client with the strongest permissions for the device."""
+        clients = self._clients[pandora_id]
+        return max(clients, key=clients.get)
+
+    async def async_command(self, pandora_id: str, command: str, predicate=None) -> bool:
+        """Send the command through the client with the strongest permissions."""
+        return await self.command_client(pandora_id).async_command(pandora_id, command, predicate)
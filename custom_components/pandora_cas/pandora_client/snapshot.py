@@ -0,0 +1,95 @@
+"""Columnar snapshot of the whole fleet.
+
+Every device gets a stable index and all telemetry is kept in fixed-type arrays,
+so external consumers can read the fleet state with a single request.
+"""
+from array import array
+import math
+import struct
+import sys
+
+SNAPSHOT_MAGIC = b"PCS1"
+
+# Column name -> (array typecode, device attribute, default value)
+SNAPSHOT_COLUMNS = {
+    "lat": ("d", "x", math.nan),
+    "lon": ("d", "y", math.nan),
+    "speed": ("f", "speed", math.nan),
+    "fuel": ("f", "fuel", math.nan),
+    "voltage": ("f", "voltage", math.nan),
+    "flags": ("Q", "bit_state_1", 0),
+    "online": ("B", "online", 0),
+}
+
+
+class PandoraFleetSnapshot:
+    """Fixed-type column arrays indexed by device index."""
+
+    def __init__(self):
+        self._index = {}
+        self._ids = []
+        self._columns = {name: array(typecode) for name, (typecode, _, _) in SNAPSHOT_COLUMNS.items()}
+        self._timestamps = array("q")
+        self._ts = 0
+
+    @property
+    def ids(self) -> list:
+        """PANDORA_IDs in the index order."""
+        return self._ids
+
+    def index(self, pandora_id: str) -> int:
+        """Get (or allocate) the index of the device."""
+        idx = self._index.get(pandora_id)
+        if idx is None:
+            idx = self._index[pandora_id] = len(self._ids)
+            self._ids.append(pandora_id)
+            for name, (_, _, default) in SNAPSHOT_COLUMNS.items():
+                self._columns[name].append(default)
+            self._timestamps.append(0)
+        return idx
+
+    def update(self, devices: dict, ts: int) -> None:
+        """Copy the current state of devices into the columns."""
+        for pandora_id, device in devices.items():
+            idx = self.index(pandora_id)
+            for name, (typecode, attr, default) in SNAPSHOT_COLUMNS.items():
+                value = device.get(attr)
+                try:
+                    value = default if value is None else (float(value) if typecode in "fd" else int(value))
+                except (TypeError, ValueError):
+                    value = default
+                self._columns[name][idx] = value
+            self._timestamps[idx] = device.timestamp
+        self._ts = ts
+
+    def as_dict(self) -> dict:
+        """JSON-friendly representation. NaN is replaced by None."""
+        result = {"ts": self._ts, "ids": self._ids, "timestamp": self._timestamps.tolist()}
+        for name, (typecode, _, _) in SNAPSHOT_COLUMNS.items():
+            column = self._columns[name].tolist()
+            if typecode in "fd":
+                column = [None if math.isnan(v) else v for v in column]
+            result[name] = column
+        return result
+
+    def as_bytes(self) -> bytes:
+        """Compact binary representation.
+
+        Layout (little-endian): magic, ts (int64), device count (uint32), ids as length-prefixed
+        UTF-8 strings, then for every column: length-prefixed name, typecode and raw array data.
+        """
+        chunks = [SNAPSHOT_MAGIC, struct.pack("<qI", self._ts, len(self._ids))]
+        for pandora_id in self._ids:
+            raw = pandora_id.encode()
+            chunks.append(struct.pack("<B", len(raw)) + raw)
+
+        columns = dict(self._columns, timestamp=self._timestamps)
+        for name, column in columns.items():
+            if sys.byteorder != "little":
+                column = array(column.typecode, column)
+                column.byteswap()
+            raw = name.encode()
+            chunks.append(struct.pack("<B", len(raw)) + raw + column.typecode.encode())
+            chunks.append(column.tobytes())
+
+        return b"".join(chunks)
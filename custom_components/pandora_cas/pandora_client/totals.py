@@ -0,0 +1,50 @@
+"""Running totals of the device state.
+
+Totals are integrated on every update from the previous sample, so they never need the history.
+"""
+
+# Total -> bit of bit_state_1 which must be set. Idle is the engine running with zero speed.
+TOTAL_BITS = {"engine": 2, "autostart": 4, "heater": 29}
+TOTALS = ("engine", "idle", "autostart", "heater")
+
+# Devices report only changes, so the state is considered unchanged between samples. But longer gaps
+# (lost connection) are accounted only partially.
+MAX_INTERVAL = 900  # s
+
+
+class PandoraTotals:
+    """Seconds spent in engine, idle, autostart and heater states."""
+
+    __slots__ = TOTALS + ("_ts", "_flags", "_speed")
+
+    def __init__(self):
+        for name in TOTALS:
+            setattr(self, name, 0.0)
+        self._ts = None
+        self._flags = 0
+        self._speed = 0
+
+    def update(self, ts: int, flags: int, speed: float) -> None:
+        """Account the interval since the previous sample and remember the new one."""
+        if self._ts is not None:
+            interval = min(ts - self._ts, MAX_INTERVAL)
+            if interval <= 0:
+                return
+            for name, bit in TOTAL_BITS.items():
+                if (self._flags >> bit) & 1:
+                    setattr(self, name, getattr(self, name) + interval)
+            if (self._flags >> TOTAL_BITS["engine"]) & 1 and not self._speed:
+                self.idle += interval
+
+        self._ts = ts
+        self._flags = int(flags)
+        self._speed = speed or 0
+
+    def as_dict(self) -> dict:
+        """Totals to be stored."""
+        return {name: getattr(self, name) for name in TOTALS}
+
+    def restore(self, data: dict) -> None:
+        """Add stored totals to the ones accumulated since start."""
+        for name in TOTALS:
+            setattr(self, name, getattr(self, name) + float(data.get(name, 0)))
@@ -0,0 +1,175 @@
+"""Compressed GPS track.
+
+Incoming positions pass an online dead-reckoning filter: a point is kept only if it can't be
+predicted from the previous kept point (its speed and heading). Stationary duplicates are dropped.
+Kept points are delta-encoded into integer arrays.
+"""
+from array import array
+import math
+
+EARTH_RADIUS = 6371000  # m
+
+COORD_SCALE = 1000000  # 1e-6 deg ~ 0.1 m
+SPEED_SCALE = 10  # 0.1 km/h
+
+STATIONARY_DISTANCE = 15  # m, GPS jitter of the parked car
+DEAD_RECKONING_THRESHOLD = 50  # m, error between predicted and real position
+HEADING_THRESHOLD = 30  # deg
+SPEED_THRESHOLD = 20  # km/h
+MAX_GAP = 600  # s, keep a point at least once per gap even if it's predictable
+MAX_POINTS = 20000
+
+
+def distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Haversine distance in meters."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS * math.asin(min(1.0, math.sqrt(a)))
+
+
+def project(lat: float, lon: float, meters: float, heading: float) -> tuple:
+    """Move the point by given distance along the heading (degrees from north)."""
+    delta = meters / EARTH_RADIUS
+    theta = math.radians(heading)
+    phi1, lambda1 = math.radians(lat), math.radians(lon)
+    phi2 = math.asin(math.sin(phi1) * math.cos(delta) + math.cos(phi1) * math.sin(delta) * math.cos(theta))
+    lambda2 = lambda1 + math.atan2(
+        math.sin(theta) * math.sin(delta) * math.cos(phi1), math.cos(delta) - math.sin(phi1) * math.sin(phi2)
+    )
+    return math.degrees(phi2), math.degrees(lambda2)
+
+
+class PandoraTrack:
+    """Delta-encoded track with online simplification."""
+
+    FIELDS = ("time", "lat", "lon", "speed", "rot")
+
+    def __init__(self, max_points: int = MAX_POINTS):
+        self._max_points = max_points
+        self._columns = {"time": array("q"), "lat": array("i"), "lon": array("i"), "speed": array("i"), "rot": array("i")}
+        self._last = None  # last kept point, decoded
+        self._last_encoded = None  # last kept point, scaled integers
+
+    def __len__(self) -> int:
+        return len(self._columns["time"])
+
+    @property
+    def last(self):
+        """Last kept point: (time, lat, lon, speed, rot) or None."""
+        return self._last
+
+    def is_significant(self, ts: int, lat: float, lon: float, speed: float, rot: float) -> bool:
+        """Check if the point can't be predicted from the last kept one."""
+        if self._last is None:
+            return True
+
+        last_ts, last_lat, last_lon, last_speed, last_rot = self._last
+        elapsed = ts - last_ts
+        if elapsed <= 0:
+            return False
+
+        moved = distance(last_lat, last_lon, lat, lon)
+        if speed == 0 and last_speed == 0:
+            return moved > STATIONARY_DISTANCE or elapsed >= MAX_GAP and moved > 0
+
+        if elapsed >= MAX_GAP or abs(speed - last_speed) > SPEED_THRESHOLD:
+            return True
+
+        heading_delta = abs((rot - last_rot + 180) % 360 - 180)
+        if heading_delta > HEADING_THRESHOLD:
+            return True
+
+        predicted = project(last_lat, last_lon, last_speed / 3.6 * elapsed, last_rot)
+        return distance(predicted[0], predicted[1], lat, lon) > DEAD_RECKONING_THRESHOLD
+
+    def append(self, ts: int, lat: float, lon: float, speed: float = 0, rot: float = 0) -> bool:
+        """Add the point to the track. Returns True if the point was kept."""
+        speed = float(speed or 0)
+        rot = float(rot or 0)
+        if not self.is_significant(ts, lat, lon, speed, rot):
+            return False
+
+        encoded = (
+            int(ts),
+            round(lat * COORD_SCALE),
+            round(lon * COORD_SCALE),
+            round(speed * SPEED_SCALE),
+            round(rot),
+        )
+        previous = self._last_encoded or (0,) * len(encoded)
+        for name, value, base in zip(self.FIELDS, encoded, previous):
+            self._columns[name].append(value - base)
+
+        self._last = (int(ts), lat, lon, speed, rot)
+        self._last_encoded = encoded
+
+        if len(self) > self._max_points:
+            self._trim(len(self) - self._max_points // 2)
+
+        return True
+
+    def points(self, start: int = None, end: int = None):
+        """Generate decoded points (time, lat, lon, speed, rot) within optional time range."""
+        acc = [0] * len(self.FIELDS)
+        for deltas in zip(*(self._columns[name] for name in self.FIELDS)):
+            acc = [a + d for a, d in zip(acc, deltas)]
+            if start is not None and acc[0] < start:
+                continue
+            if end is not None and acc[0] > end:
+                return
+            yield (acc[0], acc[1] / COORD_SCALE, acc[2] / COORD_SCALE, acc[3] / SPEED_SCALE, acc[4])
+
+    def copy(self) -> "PandoraTrack":
+        """Detached copy, e.g. to be read outside the event loop while this track is updated."""
+        track = PandoraTrack(self._max_points)
+        track._columns = {name: column[:] for name, column in self._columns.items()}
+        track._last = self._last
+        track._last_encoded = self._last_encoded
+        return track
+
+    def merge(self, points) -> int:
+        """Insert points (time, lat, lon, speed, rot) from any time, e.g. backfilled history.
+
+        The track is rebuilt through the filter in time order. Returns the change of the number of points.
+        """
+        before = len(self)
+        combined = sorted([*self.points(), *points], key=lambda point: point[0])
+        for column in self._columns.values():
+            del column[:]
+        self._last = self._last_encoded = None
+        for point in combined:
+            self.append(*point)
+        return len(self) - before
+
+    def _trim(self, count: int) -> None:
+        """Drop the oldest points. The new first point becomes absolute."""
+        base = [sum(self._columns[name][: count + 1]) for name in self.FIELDS]
+        for name, value in zip(self.FIELDS, base):
+            column = self._columns[name]
+            del column[:count]
+            column[0] = value
+
+    def as_dict(self) -> dict:
+        """Serializable representation (delta-encoded)."""
+        return {name: column.tolist() for name, column in self._columns.items()}
+
+    def restore(self, data: dict) -> None:
+        """Restore the track from as_dict() result."""
+        for name in self.FIELDS:
+            column = self._columns[name]
+            del column[:]
+            column.extend(data.get(name, []))
+
+        self._last = self._last_encoded = None
+        if len(self):
+            encoded = tuple(sum(self._columns[name]) for name in self.FIELDS)
+            self._last_encoded = encoded
+            self._last = (
+                encoded[0],
+                encoded[1] / COORD_SCALE,
+                encoded[2] / COORD_SCALE,
+                encoded[3] / SPEED_SCALE,
+                encoded[4],
+            )
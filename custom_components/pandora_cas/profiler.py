@@ -0,0 +1,63 @@
+"""On-demand profiling of the integration under the real load.
+
+cProfile sees only the thread it's enabled in, so it's enabled in the event loop thread where updates, parsers
+and entity callbacks run. Nothing is hooked while idle.
+"""
+
+import asyncio
+import cProfile
+import io
+import os
+import pstats
+import re
+import tracemalloc
+
+from homeassistant.core import HomeAssistant
+
+
+PACKAGE_PATH = os.path.dirname(os.path.abspath(__file__))
+TOP_COUNT = 20
+
+
+def _summary(profiler: cProfile.Profile, snapshot: tracemalloc.Snapshot) -> str:
+    """Top functions and allocations of the integration."""
+    stream = io.StringIO()
+    stream.write("Top functions by cumulative time\n")
+    stats = pstats.Stats(profiler, stream=stream)
+    stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(re.escape(PACKAGE_PATH), TOP_COUNT)
+
+    stream.write("Top allocations\n")
+    snapshot = snapshot.filter_traces([tracemalloc.Filter(True, os.path.join(PACKAGE_PATH, "*"))])
+    for statistic in snapshot.statistics("lineno")[:TOP_COUNT]:
+        stream.write("{}\n".format(statistic))
+
+    return stream.getvalue()
+
+
+def _write_results(profiler: cProfile.Profile, snapshot: tracemalloc.Snapshot, path: str) -> str:
+    """Write the stats file for pstats/snakeviz and the text summary."""
+    profiler.dump_stats(path + ".prof")
+    summary = _summary(profiler, snapshot)
+    with open(path + ".txt", "w", encoding="utf-8") as file:
+        file.write(summary)
+    return summary
+
+
+async def async_profile(hass: HomeAssistant, duration: float, path: str) -> str:
+    """Profile the event loop for the given time. Results are written to <path>.prof and <path>.txt."""
+    profiler = cProfile.Profile()
+    # Raises ValueError if another profiler is active, so it's enabled before tracing starts
+    profiler.enable()
+    start_tracing = not tracemalloc.is_tracing()
+    if start_tracing:
+        tracemalloc.start()
+
+    try:
+        await asyncio.sleep(duration)
+    finally:
+        profiler.disable()
+        snapshot = tracemalloc.take_snapshot()
+        if start_tracing:
+            tracemalloc.stop()
+
+    return await hass.async_add_executor_job(_write_results, profiler, snapshot, path)
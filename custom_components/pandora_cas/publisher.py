@@ -0,0 +1,83 @@
+"""Publisher of device changes to MQTT.
+
+On every update changed devices get the retained compact JSON with all attributes at
+<prefix>/<PANDORA_ID>/state and the changed attributes at <prefix>/<PANDORA_ID>/<attribute>.
+Messages of the update are published as one batch. While the broker is slow, next updates are merged
+into the pending batch (the latest payload of the topic wins), so the backlog never grows.
+"""
+import json
+import logging
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.exceptions import HomeAssistantError
+
+from .api import PandoraApi
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class PandoraMqttPublisher:
+    """Publishes device changes through the MQTT integration."""
+
+    def __init__(self, hass: HomeAssistant, api: PandoraApi, prefix: str, qos: int) -> None:
+        """Constructor"""
+        self._hass = hass
+        self._api = api
+        self._prefix = prefix.rstrip("/")
+        self._qos = qos
+        self._pending = {}
+        self._task = None
+        self.coalesced = 0
+
+    @callback
+    def async_start(self) -> CALLBACK_TYPE:
+        """Start listening for updates. Returns the function which stops the publisher."""
+        remove_listener = self._api.async_add_listener(self._async_collect)
+
+        @callback
+        def _async_stop() -> None:
+            remove_listener()
+            if self._task is not None:
+                self._task.cancel()
+
+        return _async_stop
+
+    @callback
+    def _async_collect(self) -> None:
+        """Put changes of the last update into the pending batch."""
+        for pandora_id, delta in self._api.changes.items():
+            device = self._api.devices.get(pandora_id)
+            if device is None:
+                continue
+
+            base = "{}/{}".format(self._prefix, pandora_id)
+            state = device.as_dict()
+            state["online_ts"] = device.timestamp
+            messages = {base + "/state": json.dumps(state, separators=(",", ":"))}
+            for attr, value in delta.items():
+                messages["{}/{}".format(base, attr)] = json.dumps(value)
+
+            if self._task is not None:
+                self.coalesced += len(messages.keys() & self._pending.keys())
+            self._pending.update(messages)
+
+        if self._pending and self._task is None:
+            self._task = self._hass.async_create_task(self._async_publish())
+
+    async def _async_publish(self) -> None:
+        """Publish pending batches until there is nothing left."""
+        # pylint: disable=import-outside-toplevel
+        from homeassistant.components import mqtt
+
+        try:
+            while self._pending:
+                batch, self._pending = self._pending, {}
+                for topic, payload in batch.items():
+                    await mqtt.async_publish(self._hass, topic, payload, self._qos, True)
+                _LOGGER.debug("Published %d messages, %d coalesced so far", len(batch), self.coalesced)
+        except HomeAssistantError as ex:
+            # The next update will publish the fresh state anyway
+            _LOGGER.warning("MQTT publish failed: %s", str(ex))
+            self._pending.clear()
+        finally:
+            self._task = None
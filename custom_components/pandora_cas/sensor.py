@@ -3,22 +3,41 @@ TODO
 
 DETAILS
 """
+from functools import partial
 import logging
+import os
 
-from homeassistant.components.sensor import ENTITY_ID_FORMAT
-from homeassistant.components.sensor.const import SensorDeviceClass
+from homeassistant.components.sensor import DOMAIN as SENSOR_DOMAIN, ENTITY_ID_FORMAT
+from homeassistant.components.sensor.const import SensorDeviceClass, SensorStateClass
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.const import ATTR_DEVICE_CLASS, ATTR_ICON, ATTR_NAME, PERCENTAGE, UnitOfLength, UnitOfElectricPotential, UnitOfTemperature, UnitOfSpeed
+from homeassistant.const import ATTR_DEVICE_CLASS, ATTR_ICON, ATTR_NAME, PERCENTAGE, UnitOfLength, UnitOfElectricPotential, UnitOfTemperature, UnitOfSpeed, UnitOfTime
 from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.entity import Entity, EntityCategory
 from homeassistant.util import slugify
 
 from .api import PandoraDevice
-from .base import PandoraEntity
-from .const import DOMAIN, ATTR_DEVICE_ATTR, ATTR_IS_CONNECTION_SENSITIVE, ATTR_UNITS, ATTR_FORMATTER
+from .base import PandoraEntity, async_setup_device_entities, async_setup_device_storage
+from .geocoder import PLACES_FILENAME, PandoraGeocoder
+from .const import (
+    DOMAIN,
+    ATTR_DEVICE_ATTR,
+    ATTR_IS_CONNECTION_SENSITIVE,
+    ATTR_UNITS,
+    ATTR_FORMATTER,
+    ATTR_THROTTLED,
+    ATTR_DEADBAND,
+    ATTR_HYSTERESIS,
+    ATTR_NONZERO,
+    ATTR_FEATURE,
+    ATTR_TOTAL,
+    SIGNAL_DEVICE_ADDED,
+)
 
 
 _LOGGER = logging.getLogger(__name__)
 
+FILTER_EPSILON = 1e-6
+
 
 ENTITY_CONFIGS = {
     "mileage": {
@@ -27,7 +46,8 @@ ENTITY_CONFIGS = {
         ATTR_DEVICE_CLASS: SensorDeviceClass.DISTANCE,  
         ATTR_UNITS: UnitOfLength.KILOMETERS,
         ATTR_DEVICE_ATTR: "mileage",
-        ATTR_FORMATTER: lambda v: round(float(v), 2),
+        ATTR_NONZERO: True,
+        ATTR_FORMATTER: lambda v: round(v, 2),
     },
     "fuel_level": {
         ATTR_NAME: "fuel",
@@ -42,6 +62,8 @@ ENTITY_CONFIGS = {
         ATTR_DEVICE_CLASS: SensorDeviceClass.TEMPERATURE,
         ATTR_UNITS: UnitOfTemperature.CELSIUS,
         ATTR_DEVICE_ATTR: "cabin_temp",
+        ATTR_DEADBAND: 1,
+        ATTR_HYSTERESIS: 2,
     },
     "engine_temperature": {
         ATTR_NAME: "Engine temperature",
@@ -49,6 +71,8 @@ ENTITY_CONFIGS = {
         ATTR_DEVICE_CLASS: SensorDeviceClass.TEMPERATURE,
         ATTR_UNITS: UnitOfTemperature.CELSIUS,
         ATTR_DEVICE_ATTR: "engine_temp",
+        ATTR_DEADBAND: 1,
+        ATTR_HYSTERESIS: 2,
     },
     "ambient_temperature": {
         ATTR_NAME: "Ambient temperature",
@@ -56,6 +80,8 @@ ENTITY_CONFIGS = {
         ATTR_DEVICE_CLASS: SensorDeviceClass.TEMPERATURE,
         ATTR_UNITS: UnitOfTemperature.CELSIUS,
         ATTR_DEVICE_ATTR: "out_temp",
+        ATTR_DEADBAND: 1,
+        ATTR_HYSTERESIS: 2,
     },
     "balance": {
         ATTR_NAME: "balance",
@@ -64,7 +90,7 @@ ENTITY_CONFIGS = {
         ATTR_UNITS: "₽",
         ATTR_IS_CONNECTION_SENSITIVE: False,
         ATTR_DEVICE_ATTR: "balance",
-        ATTR_FORMATTER: lambda v: round(float(v["value"]), 2),
+        ATTR_FORMATTER: lambda v: round(v, 2),
     },
     "speed": {
         ATTR_NAME: "speed",
@@ -72,7 +98,8 @@ ENTITY_CONFIGS = {
         ATTR_DEVICE_CLASS: SensorDeviceClass.SPEED,
         ATTR_UNITS: UnitOfSpeed.KILOMETERS_PER_HOUR,
         ATTR_DEVICE_ATTR: "speed",
-        ATTR_FORMATTER: lambda v: round(float(v), 1),
+        ATTR_FORMATTER: lambda v: round(v, 1),
+        ATTR_THROTTLED: True,
     },
     "engine_rpm": {
         ATTR_NAME: "engine RPM",
@@ -80,6 +107,8 @@ ENTITY_CONFIGS = {
         ATTR_DEVICE_CLASS: None,
         ATTR_UNITS: None,
         ATTR_DEVICE_ATTR: "engine_rpm",
+        ATTR_NONZERO: True,
+        ATTR_THROTTLED: True,
     },
     "gsm_level": {
         ATTR_NAME: "GSM level",
@@ -87,6 +116,8 @@ ENTITY_CONFIGS = {
         ATTR_DEVICE_CLASS: None,
         ATTR_UNITS: None,
         ATTR_DEVICE_ATTR: "gsm_level",
+        ATTR_DEADBAND: 1,
+        ATTR_HYSTERESIS: 2,
     },
     "battery_voltage": {
         ATTR_NAME: "battery",
@@ -94,22 +125,99 @@ ENTITY_CONFIGS = {
         ATTR_DEVICE_CLASS: SensorDeviceClass.VOLTAGE,
         ATTR_UNITS: UnitOfElectricPotential.VOLT,
         ATTR_DEVICE_ATTR: "voltage",
+        ATTR_DEADBAND: 0.2,
+        ATTR_HYSTERESIS: 0.3,
     },
 }
 
 
+ADDRESS_ENTITY_CONFIGS = {
+    "address": {
+        ATTR_NAME: "address",
+        ATTR_ICON: "mdi:map-marker",
+        ATTR_DEVICE_CLASS: None,
+        ATTR_UNITS: None,
+        ATTR_IS_CONNECTION_SENSITIVE: False,
+        ATTR_DEVICE_ATTR: "x",
+    },
+}
+
+
+TOTAL_ENTITY_CONFIGS = {
+    "engine_hours": {
+        ATTR_NAME: "engine hours",
+        ATTR_ICON: "mdi:engine",
+        ATTR_DEVICE_CLASS: SensorDeviceClass.DURATION,
+        ATTR_UNITS: UnitOfTime.HOURS,
+        ATTR_IS_CONNECTION_SENSITIVE: False,
+        ATTR_DEVICE_ATTR: "bit_state_1",
+        ATTR_TOTAL: "engine",
+    },
+    "idle_hours": {
+        ATTR_NAME: "idle hours",
+        ATTR_ICON: "mdi:engine-outline",
+        ATTR_DEVICE_CLASS: SensorDeviceClass.DURATION,
+        ATTR_UNITS: UnitOfTime.HOURS,
+        ATTR_IS_CONNECTION_SENSITIVE: False,
+        ATTR_DEVICE_ATTR: "bit_state_1",
+        ATTR_TOTAL: "idle",
+    },
+    "autostart_hours": {
+        ATTR_NAME: "autostart hours",
+        ATTR_ICON: "mdi:car-clock",
+        ATTR_DEVICE_CLASS: SensorDeviceClass.DURATION,
+        ATTR_UNITS: UnitOfTime.HOURS,
+        ATTR_IS_CONNECTION_SENSITIVE: False,
+        ATTR_DEVICE_ATTR: "bit_state_1",
+        ATTR_TOTAL: "autostart",
+        ATTR_FEATURE: "autostart",
+    },
+    "heater_hours": {
+        ATTR_NAME: "coolant heater hours",
+        ATTR_ICON: "mdi:radiator",
+        ATTR_DEVICE_CLASS: SensorDeviceClass.DURATION,
+        ATTR_UNITS: UnitOfTime.HOURS,
+        ATTR_IS_CONNECTION_SENSITIVE: False,
+        ATTR_DEVICE_ATTR: "bit_state_1",
+        ATTR_TOTAL: "heater",
+        ATTR_FEATURE: "heater",
+    },
+}
+
+TOTALS_STORAGE_KEY = DOMAIN + ".totals_{}"
+TOTALS_SAVE_DELAY = 60
+
+
+def _load_geocoder(path: str):
+    """Load places if the user provided them."""
+    if not os.path.isfile(path):
+        return None
+    return PandoraGeocoder.from_csv(path)
+
+
 # pylint: disable=unused-argument
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry, async_add_entities):
     """Set up ecobee binary (occupancy) sensors."""
 
-    api = hass.data[DOMAIN]
+    async_setup_device_entities(hass, entry, async_add_entities, SENSOR_DOMAIN, PandoraSensorEntity, ENTITY_CONFIGS)
+
+    await async_setup_device_storage(hass, entry, TOTALS_STORAGE_KEY, "totals", TOTALS_SAVE_DELAY)
+    async_setup_device_entities(
+        hass, entry, async_add_entities, SENSOR_DOMAIN, PandoraTotalSensorEntity, TOTAL_ENTITY_CONFIGS
+    )
 
-    sensors = []
-    for _, device in api.devices.items():
-        for entity_id, entity_config in ENTITY_CONFIGS.items():
-            sensors.append(PandoraSensorEntity(hass, device, entity_id, entity_config))
+    geocoder = await hass.async_add_executor_job(_load_geocoder, hass.config.path(PLACES_FILENAME))
+    if geocoder is not None:
+        async_setup_device_entities(
+            hass,
+            entry,
+            async_add_entities,
+            SENSOR_DOMAIN,
+            partial(PandoraAddressSensorEntity, geocoder=geocoder),
+            ADDRESS_ENTITY_CONFIGS,
+        )
 
-    async_add_entities(sensors, False)
+    async_add_entities([PandoraApiSensorEntity(hass, entry)], False)
 
 
 class PandoraSensorEntity(PandoraEntity):
@@ -124,6 +232,7 @@ class PandoraSensorEntity(PandoraEntity):
         super().__init__(hass, device, entity_id, entity_config)
 
         self.entity_id = self.ENTITY_ID_FORMAT.format("{}_{}".format(slugify(device.pandora_id), entity_id))
+        self._direction = 0
 
         user_defined_units = device.user_defined_units(self.device_attr)
         if user_defined_units is not None:
@@ -149,6 +258,30 @@ class PandoraSensorEntity(PandoraEntity):
         """"""
         return self._state
 
+    def _is_significant(self, state) -> bool:
+        """Check the change of the value against deadband and hysteresis.
+
+        Changes smaller than deadband are ignored. Reversal of the direction of the last change
+        must be not smaller than hysteresis, so the value bouncing between two levels isn't written.
+        """
+        deadband, hysteresis = self._device.user_defined_filter(self.device_attr)
+        deadband = self._config.get(ATTR_DEADBAND, 0) if deadband is None else deadband
+        hysteresis = self._config.get(ATTR_HYSTERESIS, 0) if hysteresis is None else hysteresis
+
+        if not (deadband or hysteresis) or not isinstance(self._state, (int, float)):
+            return True
+        if not isinstance(state, (int, float)):
+            return True
+
+        delta = state - self._state
+        direction = (delta > 0) - (delta < 0)
+        threshold = deadband if direction == self._direction or not self._direction else max(deadband, hysteresis)
+        if abs(delta) + FILTER_EPSILON < threshold:
+            return False
+
+        self._direction = direction
+        return True
+
     @callback
     def _update_callback(self, force=False):
         """"""
@@ -163,10 +296,13 @@ class PandoraSensorEntity(PandoraEntity):
             else:
                 expired = False
 
-            if self._state != state or self._expired != expired:
-                self._state = state
+            significant = self._state != state and self._is_significant(state)
+            if significant or self._expired != expired or self._stale != api.is_stale:
+                if significant:
+                    self._state = state
                 self._expired = expired
-                self.async_write_ha_state()
+                self._stale = api.is_stale
+                self._async_write_state()
         except KeyError:
             _LOGGER.warning("%s: can't get data from linked device", self.name)
 
@@ -175,3 +311,135 @@ class PandoraSensorEntity(PandoraEntity):
 
         self.async_on_remove(self._hass.data[DOMAIN].async_add_listener(self._update_callback))
         self._update_callback(True)
+
+
+class PandoraAddressSensorEntity(PandoraSensorEntity):
+    """Name of the nearest known place."""
+
+    def __init__(self, hass, device: PandoraDevice, entity_id: str, entity_config: dict, geocoder: PandoraGeocoder):
+        """Constructor."""
+        super().__init__(hass, device, entity_id, entity_config)
+        self._geocoder = geocoder
+        self._position = None
+        self._lookup = None
+
+    @callback
+    def _update_callback(self, force=False):
+        """Look up the place when the car has left the quantum of the last position."""
+        try:
+            position = self._geocoder.quantize(self._device.x, self._device.y)
+        except KeyError:
+            return
+
+        if position != self._position:
+            self._position = position
+            # Result of the previous lookup isn't needed anymore, the car has moved
+            self._cancel_lookup()
+            self._lookup = self._hass.async_create_task(self._async_lookup(position))
+
+    async def _async_lookup(self, position: tuple) -> None:
+        state = await self._hass.async_add_executor_job(self._geocoder.lookup_quantized, *position)
+        self._lookup = None
+        if self._state != state:
+            self._state = state
+            self._async_write_state()
+
+    def _cancel_lookup(self) -> None:
+        """Cancel the lookup in progress if any."""
+        if self._lookup is not None:
+            self._lookup.cancel()
+            self._lookup = None
+
+    async def async_will_remove_from_hass(self):
+        """Don't write the state of the removed entity when the lookup completes."""
+        await super().async_will_remove_from_hass()
+        self._cancel_lookup()
+
+
+class PandoraTotalSensorEntity(PandoraSensorEntity):
+    """Running total of the device state in hours."""
+
+    @property
+    def capability_attributes(self):
+        """Total is only growing, so long-term statistics can be compiled from it."""
+        return {"state_class": SensorStateClass.TOTAL_INCREASING}
+
+    @callback
+    def _update_callback(self, force=False):
+        """"""
+        state = round(getattr(self._device.totals, self._config[ATTR_TOTAL]) / 3600, 2)
+        if self._state != state or force:
+            self._state = state
+            self._async_write_state()
+
+
+class PandoraApiSensorEntity(Entity):
+    """Diagnostic sensor with the state of the connection to the server."""
+
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+
+    def __init__(self, hass, entry: ConfigEntry):
+        """Constructor."""
+        self._hass = hass
+        self._entry = entry
+        self._state = None
+        self._counters = None
+        self.entity_id = ENTITY_ID_FORMAT.format("{}_api".format(DOMAIN))
+
+    @property
+    def unique_id(self) -> str:
+        """Return the unique id of the sensor."""
+        return "{}_{}_api".format(DOMAIN, self._entry.entry_id)
+
+    @property
+    def name(self) -> str:
+        """Return the name of the sensor."""
+        return "Pandora API"
+
+    @property
+    def icon(self) -> str:
+        """Return the icon of the sensor."""
+        return "mdi:cloud-check" if self._state == "closed" else "mdi:cloud-alert"
+
+    @property
+    def should_poll(self) -> bool:
+        """Return False."""
+        return False
+
+    @property
+    def state(self):
+        """Circuit breaker state: closed, open or half_open."""
+        return self._state
+
+    @property
+    def extra_state_attributes(self):
+        """Return the state attributes of the sensor."""
+        api = self._hass.data[DOMAIN]
+        attributes = {"failures": api.circuit_breaker.failures, "retry_in": round(api.circuit_breaker.retry_in)}
+        for endpoint, count in api.timeouts.items():
+            attributes["{}_timeouts".format(endpoint)] = count
+        attributes["rate_limited"] = api.rate_limiter.dropped
+        attributes["host"] = api.host_selector.select()
+        return attributes
+
+    @callback
+    def _update_callback(self, force=False):
+        """"""
+        api = self._hass.data[DOMAIN]
+        state = api.circuit_breaker.state
+        counters = (
+            api.circuit_breaker.failures,
+            tuple(api.timeouts.values()),
+            api.rate_limiter.dropped,
+            api.host_selector.select(),
+        )
+        if self._state != state or self._counters != counters or force:
+            self._state = state
+            self._counters = counters
+            self.async_write_ha_state()
+
+    async def async_added_to_hass(self):
+        """When entity is added to hass."""
+
+        self.async_on_remove(self._hass.data[DOMAIN].async_add_listener(self._update_callback))
+        self._update_callback(True)
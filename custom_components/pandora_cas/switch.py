@@ -0,0 +1,102 @@
+"""
+Engine, coolant heater and external channel of the car as switch entities.
+"""
+import logging
+
+from homeassistant.components.switch import DOMAIN as SWITCH_DOMAIN, ENTITY_ID_FORMAT, SwitchEntity
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import ATTR_DEVICE_CLASS, ATTR_ICON, ATTR_NAME
+from homeassistant.core import HomeAssistant
+from homeassistant.util import slugify
+
+from .api import PandoraDevice
+from .base import PandoraCommandEntity, async_setup_device_entities
+from .const import (
+    ATTR_DEVICE_ATTR,
+    ATTR_SHIFT_BITS,
+    ATTR_FEATURE,
+    ATTR_PERMISSION,
+    ATTR_COMMAND_ON,
+    ATTR_COMMAND_OFF,
+)
+
+
+_LOGGER = logging.getLogger(__name__)
+
+
+ENTITY_CONFIGS = {
+    "engine": {
+        ATTR_NAME: "engine",
+        ATTR_ICON: {True: "mdi:fan", False: "mdi:fan-off"},
+        ATTR_DEVICE_CLASS: None,
+        ATTR_FEATURE: "autostart",
+        ATTR_PERMISSION: "control",
+        ATTR_DEVICE_ATTR: "bit_state_1",
+        ATTR_SHIFT_BITS: 2,
+        ATTR_COMMAND_ON: "4",
+        ATTR_COMMAND_OFF: "8",
+    },
+    "coolant_heater": {
+        ATTR_NAME: "coolant heater",
+        ATTR_ICON: {True: "mdi:thermometer-plus", False: "mdi:thermometer"},
+        ATTR_DEVICE_CLASS: None,
+        ATTR_FEATURE: "heater",
+        ATTR_PERMISSION: "control",
+        ATTR_DEVICE_ATTR: "bit_state_1",
+        ATTR_SHIFT_BITS: 29,
+        ATTR_COMMAND_ON: "21",
+        ATTR_COMMAND_OFF: "22",
+    },
+    # There is no state bit of the external channel, so its state is assumed
+    "ext_channel": {
+        ATTR_NAME: "external channel",
+        ATTR_ICON: {True: "mdi:export", False: "mdi:export"},
+        ATTR_DEVICE_CLASS: None,
+        ATTR_FEATURE: "channel",
+        ATTR_PERMISSION: "control",
+        ATTR_DEVICE_ATTR: "bit_state_1",
+        ATTR_SHIFT_BITS: None,
+        ATTR_COMMAND_ON: "33",
+        ATTR_COMMAND_OFF: "34",
+    },
+}
+
+
+# pylint: disable=unused-argument
+async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry, async_add_entities):
+    """Set up the switches."""
+
+    async_setup_device_entities(hass, entry, async_add_entities, SWITCH_DOMAIN, PandoraSwitchEntity, ENTITY_CONFIGS)
+
+
+class PandoraSwitchEntity(PandoraCommandEntity, SwitchEntity):
+    """Switch controlled by a pair of commands."""
+
+    ENTITY_ID_FORMAT = ENTITY_ID_FORMAT
+
+    def __init__(
+        self, hass, device: PandoraDevice, entity_id: str, entity_config: dict,
+    ):
+        """Constructor."""
+        super().__init__(hass, device, entity_id, entity_config)
+
+        self._state = False
+        self.entity_id = self.ENTITY_ID_FORMAT.format("{}_{}".format(slugify(device.pandora_id), entity_id))
+
+    @property
+    def icon(self) -> str:
+        """Return the icon of the switch."""
+        return self._config[ATTR_ICON][bool(self._state)]
+
+    @property
+    def is_on(self) -> bool:
+        """Return the state of the switch."""
+        return self._state
+
+    async def async_turn_on(self, **kwargs) -> None:
+        """Send the "on" command."""
+        await self._async_command(True)
+
+    async def async_turn_off(self, **kwargs) -> None:
+        """Send the "off" command."""
+        await self._async_command(False)
@@ -0,0 +1,59 @@
+"""HTTP views of Pandora Car Alarm System integration."""
+from aiohttp import web
+from homeassistant.components.http import HomeAssistantView
+
+from .api import PandoraApi
+from .const import DOMAIN
+
+METRICS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def get_api(hass):
+    """Get API instance if the integration is loaded."""
+    api = hass.data.get(DOMAIN)
+    return api if isinstance(api, PandoraApi) else None
+
+
+class PandoraSnapshotView(HomeAssistantView):
+    """Columnar snapshot of the whole fleet.
+
+    Returns JSON by default and the binary layout of PandoraFleetSnapshot.as_bytes() with ?format=binary.
+    """
+
+    url = "/api/pandora_cas/snapshot"
+    name = "api:pandora_cas:snapshot"
+
+    async def get(self, request):
+        """Handle GET request."""
+        api = get_api(request.app["hass"])
+        if api is None:
+            return self.json_message("Pandora CAS isn't loaded", 503)
+
+        if request.query.get("format") == "binary":
+            return web.Response(body=api.snapshot.as_bytes(), content_type="application/octet-stream")
+
+        return self.json(api.snapshot.as_dict())
+
+
+class PandoraMetricsView(HomeAssistantView):
+    """Prometheus metrics of devices and the API client.
+
+    Text is rendered once per update, so the cost of scraping doesn't depend on its frequency.
+    """
+
+    url = "/api/pandora_cas/metrics"
+    name = "api:pandora_cas:metrics"
+
+    async def get(self, request):
+        """Handle GET request."""
+        api = get_api(request.app["hass"])
+        if api is None:
+            return self.json_message("Pandora CAS isn't loaded", 503)
+
+        return web.Response(body=api.metrics_text(), headers={"Content-Type": METRICS_CONTENT_TYPE})
+
+
+def async_register_views(hass) -> None:
+    """Register HTTP views."""
+    hass.http.register_view(PandoraSnapshotView())
+    hass.http.register_view(PandoraMetricsView())
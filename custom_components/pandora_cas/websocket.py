@@ -0,0 +1,60 @@
+"""Websocket commands of Pandora Car Alarm System integration."""
+from time import time
+
+import voluptuous as vol
+from homeassistant.components import websocket_api
+from homeassistant.core import HomeAssistant, callback
+
+from .pandora_client.history import HISTORY_ATTRIBUTES, HISTORY_RESOLUTION, HISTORY_SIZE
+from .views import get_api
+
+
+@websocket_api.websocket_command({vol.Required("type"): "pandora_cas/snapshot"})
+@callback
+def websocket_snapshot(hass: HomeAssistant, connection: websocket_api.ActiveConnection, msg: dict) -> None:
+    """Return columnar snapshot of the whole fleet."""
+    api = get_api(hass)
+    if api is None:
+        connection.send_error(msg["id"], "not_loaded", "Pandora CAS isn't loaded")
+        return
+
+    connection.send_result(msg["id"], api.snapshot.as_dict())
+
+
+@websocket_api.websocket_command(
+    {
+        vol.Required("type"): "pandora_cas/history",
+        vol.Optional("ids"): [str],
+        vol.Optional("attributes", default=list(HISTORY_ATTRIBUTES)): [vol.In(HISTORY_ATTRIBUTES)],
+        vol.Optional("hours", default=24): vol.All(
+            vol.Coerce(float), vol.Range(min=0, min_included=False, max=HISTORY_SIZE * HISTORY_RESOLUTION / 3600)
+        ),
+        vol.Optional("points", default=100): vol.All(int, vol.Range(min=1, max=HISTORY_SIZE)),
+    }
+)
+@callback
+def websocket_history(hass: HomeAssistant, connection: websocket_api.ActiveConnection, msg: dict) -> None:
+    """Return downsampled recent history of many devices and attributes from memory."""
+    api = get_api(hass)
+    if api is None:
+        connection.send_error(msg["id"], "not_loaded", "Pandora CAS isn't loaded")
+        return
+
+    end = int(time())
+    start = end - int(msg["hours"] * 3600)
+    devices = {}
+    for pandora_id in msg.get("ids") or list(api.devices):
+        device = api.devices.get(pandora_id)
+        if device is not None:
+            devices[pandora_id] = device.history.downsample(msg["attributes"], start, end, msg["points"])
+
+    connection.send_result(
+        msg["id"], {"start": start, "end": end, "step": (end - start) / msg["points"], "devices": devices}
+    )
+
+
+@callback
+def async_register_commands(hass: HomeAssistant) -> None:
+    """Register websocket commands."""
+    websocket_api.async_register_command(hass, websocket_snapshot)
+    websocket_api.async_register_command(hass, websocket_history)
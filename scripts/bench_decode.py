@@ -0,0 +1,128 @@
+"""Benchmark of decoding and parsing of update responses on and off the event loop.
+
+Builds synthetic /api/updates payloads of different sizes and measures how long the event loop is
+stalled when the response is decoded and parsed inline, in a thread of the executor and in a worker process.
+json.loads and the parser hold the GIL, so the thread doesn't help. The process pays for pickling
+of the result, which is unpickled on the loop.
+
+Run from the repository root (requires aiohttp and yarl, like the client itself):
+
+    python scripts/bench_decode.py
+"""
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+import json
+import os
+import random
+import sys
+from time import perf_counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "custom_components", "pandora_cas"))
+
+# pylint: disable=wrong-import-position
+from pandora_client.api import PandoraApiUpdateResponseParser, _decode  # noqa: E402
+
+SIZES = ((10, 100), (100, 2000), (500, 10000))  # (devices, events)
+ROUNDS = 20
+
+
+def build_payload(devices: int, events: int) -> bytes:
+    """Updates response with stats of all devices and the events tape."""
+    rnd = random.Random(devices)
+    stats = {
+        str(1000 + idx): {
+            "online": 1,
+            "move": rnd.randint(0, 1),
+            "dtime": 1599721704,
+            "dtime_rec": 1599696508,
+            "voltage": round(rnd.uniform(11.5, 14.5), 1),
+            "engine_temp": rnd.randint(-20, 90),
+            "cabin_temp": rnd.randint(-20, 40),
+            "out_temp": rnd.randint(-30, 35),
+            "x": rnd.uniform(54, 56),
+            "y": rnd.uniform(36, 38),
+            "speed": rnd.uniform(0, 120),
+            "rot": rnd.randint(0, 359),
+            "engine_rpm": rnd.randint(0, 4000),
+            "fuel": rnd.randint(0, 100),
+            "gsm_level": rnd.randint(0, 3),
+            "bit_state_1": rnd.getrandbits(32),
+            "balance": {"value": "142.75", "cur": "RUB"},
+            "mileage": rnd.uniform(0, 200000),
+        }
+        for idx in range(devices)
+    }
+    lenta = [
+        {
+            "type": 0,
+            "time": 1600553265 + idx,
+            "obj": {"dev_id": 1000 + idx % devices, "id": idx, "x": 54.9, "y": 82.9, "speed": 0, "eventid1": 14},
+        }
+        for idx in range(events)
+    ]
+    response = {"ts": 1599698262, "lenta": lenta, "time": {key: {"online": 1599696535} for key in stats}}
+    response["stats"] = stats
+    return json.dumps(response).encode()
+
+
+def _decode_inline(body: bytes):
+    return _decode(body, PandoraApiUpdateResponseParser)
+
+
+async def loop_stall(body: bytes, executor=None) -> tuple:
+    """Median and maximum event loop stall while the response is decoded and parsed, ms.
+
+    Executor False decodes inline, None in the default thread pool.
+
+    The stall is measured the same way in all modes: a ticker task yields to the loop and records
+    the longest gap between its runs during every call.
+    """
+    loop = asyncio.get_running_loop()
+    stalls = []
+    for _ in range(ROUNDS):
+        stall = 0.0
+        done = False
+
+        async def _ticker():
+            nonlocal stall
+            while not done:
+                started = perf_counter()
+                await asyncio.sleep(0)
+                stall = max(stall, (perf_counter() - started) * 1000)
+
+        ticker = asyncio.ensure_future(_ticker())
+        await asyncio.sleep(0)
+        if executor is False:
+            _decode_inline(body)
+            await asyncio.sleep(0)
+        else:
+            await loop.run_in_executor(executor, _decode_inline, body)
+        done = True
+        await ticker
+        stalls.append(stall)
+
+    stalls.sort()
+    return stalls[len(stalls) // 2], stalls[-1]
+
+
+async def main() -> None:
+    """Print results for all payload sizes."""
+    modes = (("inline", False), ("thread", None), ("process", ProcessPoolExecutor(1)))
+    # Start the worker process before measuring
+    await asyncio.get_running_loop().run_in_executor(modes[2][1], _decode_inline, build_payload(1, 1))
+
+    print("Event loop stall per response, median / max of {} rounds, ms".format(ROUNDS))
+    print("{:>8} {:>7} {:>10}".format("devices", "events", "size, KiB") + "".join("{:>18}".format(m) for m, _ in modes))
+    for devices, events in SIZES:
+        body = build_payload(devices, events)
+        row = "{:>8} {:>7} {:>10}".format(devices, events, len(body) // 1024)
+        for _, executor in modes:
+            median, longest = await loop_stall(body, executor)
+            row += "{:>18}".format("{:.2f} / {:.2f}".format(median, longest))
+        print(row)
+
+    modes[2][1].shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,8 @@
+"""The HA-independent client is imported as a top-level package, like the standalone poller does.
+Integration modules are imported from custom_components."""
+import os
+import sys
+
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "custom_components", "pandora_cas"))
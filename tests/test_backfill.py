@@ -0,0 +1,140 @@
+"""Backfill of the history against the fake server."""
+import asyncio
+import json
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from pandora_client import api
+from pandora_client.api import (
+    BACKFILL_CHUNK,
+    BACKFILL_CONCURRENCY,
+    PRIORITY_BACKFILL,
+    PandoraApiException,
+    PandoraApiRateLimited,
+    PandoraClient,
+    PandoraRateLimiter,
+)
+
+HOURS = 10
+POINTS = [{"ts": ts, "x": 55 + ts * 1e-5, "y": 37.0, "speed": 60, "rot": 0} for ts in range(0, HOURS * 3600, 30)]
+EVENTS = [{"obj": {"dtime": ts, "eventid1": 1, "eventid2": 2, "title": "e"}} for ts in range(0, HOURS * 3600, 600)]
+
+
+class FakeResponse:
+    """Response of the fake server."""
+
+    def __init__(self, server, url):
+        self._server = server
+        self._url = url
+        self.status = 200
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        pass
+
+    async def read(self) -> bytes:
+        return await self._server.handle(self._url)
+
+
+class FakeServer:
+    """Session serving paginated history. Requests of the failing chunk get "status":"fail"."""
+
+    def __init__(self, fail_from=None):
+        self.fail_from = fail_from
+        self.requests = []
+        self.active = 0
+        self.peak_active = 0
+        self.peak_tasks = 0
+
+    def request(self, method, url, **kwargs):
+        return FakeResponse(self, url)
+
+    async def close(self):
+        pass
+
+    async def handle(self, url: str) -> bytes:
+        parsed = urlparse(url)
+        if parsed.path.endswith("/login"):
+            return b'{"status": "success", "session_id": "sid"}'
+
+        query = {key: int(value[0]) for key, value in parse_qs(parsed.query).items()}
+        self.requests.append((parsed.path, query["from"]))
+        self.active += 1
+        self.peak_active = max(self.peak_active, self.active)
+        self.peak_tasks = max(self.peak_tasks, len(asyncio.all_tasks()))
+        try:
+            await asyncio.sleep(0.01)
+        finally:
+            self.active -= 1
+
+        if query["from"] == self.fail_from:
+            return b'{"status": "fail", "error_text": "boom"}'
+        if parsed.path == api.TRACK_PATH:
+            points = [point for point in POINTS if query["from"] <= point["ts"] < query["to"]]
+            return json.dumps({"points": points[: query["limit"]]}).encode()
+        events = [event for event in EVENTS if query["from"] <= event["obj"]["dtime"] < query["to"]]
+        return json.dumps({"lenta": events[: query["limit"]]}).encode()
+
+
+def _client(server: FakeServer) -> PandoraClient:
+    client = PandoraClient("user", "password", 60, session=server)
+    # Fast bucket, so the test doesn't wait for real tokens but still runs out of them
+    client._limiter = PandoraRateLimiter(rate=200)  # pylint: disable=protected-access
+    return client
+
+
+def test_history_is_paginated(monkeypatch):
+    """All points and events are fetched page by page and sorted by time."""
+    monkeypatch.setattr(api, "BACKFILL_PAGE_SIZE", 50)
+    server = FakeServer()
+    client = _client(server)
+
+    points, events = asyncio.run(client.async_fetch_history("1", 0, HOURS * 3600))
+
+    assert [point["ts"] for point in points] == [point["ts"] for point in POINTS]
+    assert [event["ts"] for event in events] == [event["obj"]["dtime"] for event in EVENTS]
+    # 120 points per hour chunk are 3 pages, one more page for events of every chunk
+    assert len(server.requests) == HOURS * 4
+    assert server.peak_active <= BACKFILL_CONCURRENCY
+    # Main task, workers and their requests. No task per chunk.
+    assert server.peak_tasks <= 1 + 2 * BACKFILL_CONCURRENCY
+    # Much more requests than the bucket allows at once: backfill waited for tokens instead of being dropped
+    assert client.rate_limiter.dropped == 0
+
+
+def test_error_cancels_remaining_chunks():
+    """Failed chunk fails the whole backfill, the rest of chunks aren't requested."""
+    server = FakeServer(fail_from=BACKFILL_CHUNK)
+    client = _client(server)
+
+    async def _fetch():
+        with pytest.raises(PandoraApiException, match="boom"):
+            await client.async_fetch_history("1", 0, HOURS * 3600)
+        requested = len(server.requests)
+        await asyncio.sleep(0.1)
+        return requested
+
+    requested = asyncio.run(_fetch())
+
+    assert len(server.requests) == requested
+    assert requested < 2 * HOURS
+
+
+def test_backfill_waits_for_tokens():
+    """Backfill waits for the reserve of other priorities to refill and gives up after the timeout."""
+
+    async def _acquire():
+        limiter = PandoraRateLimiter(rate=100, burst=10)
+        for _ in range(4):
+            await limiter.acquire(PRIORITY_BACKFILL, 0)
+        await limiter.acquire(PRIORITY_BACKFILL, 1)
+        with pytest.raises(PandoraApiRateLimited):
+            await limiter.acquire(PRIORITY_BACKFILL, 0)
+        return limiter
+
+    limiter = asyncio.run(_acquire())
+
+    assert limiter.dropped == 1
@@ -0,0 +1,163 @@
+"""MQTT publisher against the stub broker."""
+import asyncio
+import json
+
+import pytest
+
+mqtt = pytest.importorskip("homeassistant.components.mqtt")
+
+# pylint: disable=wrong-import-position
+from homeassistant.exceptions import HomeAssistantError  # noqa: E402
+
+from custom_components.pandora_cas.publisher import PandoraMqttPublisher  # noqa: E402
+
+
+class FakeHass:
+    """Just enough of Home Assistant to run the publisher task."""
+
+    def async_create_task(self, coro):
+        return asyncio.get_running_loop().create_task(coro)
+
+
+class FakeDevice:
+    """Device with all attributes in one dict."""
+
+    def __init__(self, attributes):
+        self.attributes = attributes
+        self.timestamp = 1000
+
+    def as_dict(self):
+        return dict(self.attributes)
+
+
+class FakeApi:
+    """Update source: every update changes the attributes of devices and notifies listeners."""
+
+    def __init__(self, devices):
+        self.devices = {pandora_id: FakeDevice({}) for pandora_id in devices}
+        self.changes = {}
+        self._listeners = []
+
+    def async_add_listener(self, update_callback):
+        self._listeners.append(update_callback)
+        return lambda: self._listeners.remove(update_callback)
+
+    def update(self, changes):
+        for pandora_id, delta in changes.items():
+            self.devices[pandora_id].attributes.update(delta)
+        self.changes = changes
+        for update_callback in list(self._listeners):
+            update_callback()
+
+
+class StubBroker:
+    """Records published messages. Publishing blocks while the broker is stalled."""
+
+    def __init__(self):
+        self.published = []
+        self.ready = asyncio.Event()
+        self.ready.set()
+        self.error = None
+
+    async def async_publish(self, hass, topic, payload, qos=0, retain=False):
+        await self.ready.wait()
+        if self.error is not None:
+            raise self.error
+        self.published.append((topic, payload, qos, retain))
+
+
+@pytest.fixture(name="run")
+def fixture_run(monkeypatch):
+    """Run the scenario with the stub broker patched into the MQTT integration."""
+
+    def _run_scenario(scenario):
+        async def _main():
+            broker = StubBroker()
+            monkeypatch.setattr(mqtt, "async_publish", broker.async_publish)
+            api = FakeApi(["1", "2"])
+            publisher = PandoraMqttPublisher(FakeHass(), api, "pandora/", 1)
+            stop = publisher.async_start()
+            try:
+                return await scenario(broker, api, publisher)
+            finally:
+                stop()
+
+        return asyncio.run(_main())
+
+    return _run_scenario
+
+
+async def _drain():
+    for _ in range(10):
+        await asyncio.sleep(0)
+
+
+def test_update_is_published_as_batch(run):
+    """Every changed device gets the retained state and changed attributes."""
+
+    async def _scenario(broker, api, publisher):
+        api.update({"1": {"speed": 42.0, "fuel": 50}, "2": {"voltage": 12.6}})
+        await _drain()
+        return broker.published
+
+    published = run(_scenario)
+
+    topics = {topic: payload for topic, payload, _, _ in published}
+    assert set(topics) == {
+        "pandora/1/state",
+        "pandora/1/speed",
+        "pandora/1/fuel",
+        "pandora/2/state",
+        "pandora/2/voltage",
+    }
+    assert json.loads(topics["pandora/1/state"]) == {"speed": 42.0, "fuel": 50, "online_ts": 1000}
+    assert json.loads(topics["pandora/1/speed"]) == 42.0
+    assert all(qos == 1 and retain for _, _, qos, retain in published)
+
+
+def test_slow_broker_backlog_is_merged(run):
+    """Updates arriving while the broker is stalled are merged, the latest payload of the topic wins."""
+
+    async def _scenario(broker, api, publisher):
+        broker.ready.clear()
+        api.update({"1": {"speed": 10.0}})
+        await _drain()
+        # First message is in flight, the rest of the batch is taken by the task
+        for speed in range(20, 120, 10):
+            api.update({"1": {"speed": float(speed)}})
+        await _drain()
+        backlog = len(publisher._pending)  # pylint: disable=protected-access
+        broker.ready.set()
+        await _drain()
+        return backlog, broker.published, publisher.coalesced
+
+    backlog, published, coalesced = run(_scenario)
+
+    # Ten updates of the same device don't grow the backlog beyond its topics
+    assert backlog == 2
+    assert coalesced == 18
+    assert len(published) == 4
+    assert published[-2:] == [
+        ("pandora/1/state", '{"speed":110.0,"online_ts":1000}', 1, True),
+        ("pandora/1/speed", "110.0", 1, True),
+    ]
+
+
+def test_publish_error_drops_backlog(run):
+    """Failed batch is dropped, the next update publishes the fresh state."""
+
+    async def _scenario(broker, api, publisher):
+        broker.error = HomeAssistantError("broker is down")
+        api.update({"1": {"speed": 10.0}})
+        await _drain()
+        failed = list(broker.published)
+        broker.error = None
+        api.update({"2": {"fuel": 30}})
+        await _drain()
+        return failed, broker.published, publisher._pending  # pylint: disable=protected-access
+
+    failed, published, pending = run(_scenario)
+
+    assert failed == []
+    assert [topic for topic, _, _, _ in published] == ["pandora/2/state", "pandora/2/fuel"]
+    assert pending == {}